@@ -1,4 +1,17 @@
-from .ledger import LedgerRecord, LedgerStore, sha256, merkle_root
+from .ledger import LedgerRecord, LedgerStore, SealedRecord, Snapshot, seal, sha256, merkle_root, leaf_digest, LEAF_JSON, LEAF_BINARY
+from .encoding import encode_record, decode_record
 from .codec import encode_lossless, decode_lossless, partition_multiplicative, partition_inverse
 from .entropy import shannon_entropy, ledger_entropy_shannon, ledger_entropy_mdl, Query, QuerySet
 from .prov import prov_jsonld
+from .merkle import MerkleTree, merkle_root_parallel, verify_inclusion, verify_consistency, verify_multiproof
+from .storage import SegmentStore, SyncPolicy
+from .columnar import ColumnarRecords
+from .index import RecordIndex
+from .lineage import LineageGraph
+from .smt import SparseMerkleTree, verify_smt_proof
+from .bloom import DigestFilter
+from .energy import EnergySums
+from .timeindex import TimeIndex
+from .server import LedgerServer
+from .shard import ShardedLedger, ShardProcess, shard_of, verify_sharded_inclusion
+from .sync import serve_sync, pull
@@ -0,0 +1,94 @@
+from __future__ import annotations
+from math import ceil, log
+from typing import Any, List, Optional, Tuple
+import hashlib
+from .encoding import raw_digest
+from .index import View
+
+def _probe_key(digest: str) -> bytes:
+    # digests are already uniform; anything else is hashed first
+    return raw_digest(digest) or hashlib.sha256(digest.encode()).digest()
+
+class DigestFilter(View):
+    """Scalable Bloom filter over inputs/outputs digests.
+
+    Answers "might this digest be in the ledger?" from memory, so most misses
+    never reach the segment files. Records go to a chain of filters: the
+    first holds `block` records and each one after it twice as many, so a
+    ledger of n records has O(log n) filters. Filter k is sized for
+    ``fp_rate / 2**(k+1)``, which keeps the false-positive rate of the whole
+    ledger under `fp_rate` however far it grows. `bits_per_key` instead
+    fixes the bits spent per digest in every filter, bounding memory at
+    about ``bits_per_key / 4`` bytes per record with no rate guarantee.
+    Only the newest filter takes inserts, so keeping the view current costs
+    O(1) per append.
+    """
+    name = "bloom"
+    format = 2  # digests probed by raw_digest
+
+    def __init__(self, fp_rate: float = 0.01, block: int = 1 << 16,
+                 bits_per_key: Optional[float] = None) -> None:
+        super().__init__()
+        assert 0 < fp_rate < 1 and block > 0
+        self.fp_rate, self.block, self.bits_per_key = fp_rate, block, bits_per_key
+        self._filters: List[Tuple[bytearray, int, int]] = []  # (bits, nbits, hashes)
+        self._next = 0  # first record of the next filter
+
+    def reset(self) -> None:
+        self.__init__(self.fp_rate, self.block, self.bits_per_key)
+
+    def loads(self, data: bytes) -> None:
+        mine = (self.fp_rate, self.block, self.bits_per_key)
+        super().loads(data)
+        if (self.fp_rate, self.block, self.bits_per_key) != mine:
+            self.__init__(*mine)  # saved with other settings: rebuilt from the records
+
+    def _grow(self) -> None:
+        k = len(self._filters)
+        records = self.block << k
+        bits_per_key = self.bits_per_key
+        if bits_per_key is None:
+            bits_per_key = -log(self.fp_rate / 2 ** (k + 1)) / log(2) ** 2
+        nbits = max(64, ceil(2 * records * bits_per_key))  # inputs and outputs digest
+        self._filters.append((bytearray(-(-nbits // 8)), nbits, max(1, round(bits_per_key * log(2)))))
+        self._next += records
+
+    @staticmethod
+    def _hashes(digest: str) -> Tuple[int, int]:
+        raw = _probe_key(digest)
+        return int.from_bytes(raw[:8], "little"), int.from_bytes(raw[8:16], "little") | 1
+
+    def add(self, i: int, rec: Any) -> None:
+        if i >= self._next:
+            self._grow()
+        f, m, k = self._filters[-1]
+        for digest in (rec.inputs_digest, rec.outputs_digest):
+            h1, h2 = self._hashes(digest)
+            for j in range(k):
+                p = (h1 + j * h2) % m
+                f[p >> 3] |= 1 << (p & 7)
+        self.size = i + 1
+
+    def truncate(self, size: int, records: Any) -> bool:
+        # bits cannot be cleared, so only the filters started after `size` go;
+        # bits left set by dropped records can only cost false positives
+        while self._filters and self._next - (self.block << (len(self._filters) - 1)) >= size:
+            self._filters.pop()
+            self._next -= self.block << len(self._filters)
+        self.size = size
+        return True
+
+    def might_contain(self, digest: str) -> bool:
+        """False means `digest` is in no record; True may be a false positive."""
+        h1, h2 = self._hashes(digest)
+        for f, m, k in self._filters:
+            for j in range(k):
+                p = (h1 + j * h2) % m
+                if not f[p >> 3] & (1 << (p & 7)):
+                    break
+            else:
+                return True
+        return False
+
+    def nbytes(self) -> int:
+        return sum(len(f) for f, _, _ in self._filters)
@@ -2,6 +2,7 @@ from __future__ import annotations
 import argparse, json, time, sys
 from .ledger import LedgerStore, LedgerRecord, sha256, digest_obj
 from .codec import encode_lossless, decode_lossless
+from .index import RecordIndex
 from .entropy import Query, QuerySet, ledger_entropy_shannon, ledger_entropy_mdl
 
 def demo():
@@ -38,9 +39,19 @@ def main(argv=None):
     parser = argparse.ArgumentParser(description="onu-ledger CLI")
     sub = parser.add_subparsers(dest="cmd")
     sub.add_parser("demo")
+    p = sub.add_parser("serve", help="share a durable ledger over a local socket")
+    p.add_argument("path", help="ledger directory")
+    p.add_argument("--socket", help="Unix socket path (default: TCP)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=7717)
+    p.add_argument("--max-batch", type=int, default=4096)
     args = parser.parse_args(argv)
     if args.cmd == "demo":
         demo()
+    elif args.cmd == "serve":
+        from .server import serve
+        store = LedgerStore.open(args.path, views=[RecordIndex()])
+        serve(store, args.socket, args.host, args.port, args.max_batch)
     else:
         parser.print_help()
 
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List
+from .ledger import LedgerRecord
+from .encoding import encode_value, decode_value
+from .intern import PayloadTable
+
+_DIGESTS = ("inputs_digest", "outputs_digest", "delta_signature")
+
+class ColumnarRecords:
+    """In-memory, struct-of-arrays record sequence for very large ledgers.
+
+    Digests live in packed 32-byte columns, `op_id`/`kind` are dictionary
+    encoded, `energy_delta` is a float64 column and gauge/metadata are kept as
+    encoded blobs that are only decoded when a record is materialised; a
+    payload that repeats is interned in a `PayloadTable` and the record keeps
+    just its slot. Values
+    that do not fit a column (non-hex digests, non-float energies) go to a
+    small side table so every record round-trips exactly.
+
+    Pass it as ``LedgerStore(records=ColumnarRecords())``; indexing returns a
+    fresh LedgerRecord, so callers can never mutate stored state.
+    """
+
+    def __init__(self) -> None:
+        self._digests = [bytearray() for _ in _DIGESTS]
+        self._strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._op_id = array("I")
+        self._kind = array("I")
+        self._energy = array("d")
+        self._blobs = bytearray()
+        self._blob_end = array("Q")
+        self._refs = array("i")  # gauge, metadata slot per record; -1 = inline
+        self._payloads = PayloadTable()
+        self._exceptions: Dict[Any, Any] = {}
+
+    def _code(self, s: str) -> int:
+        code = self._codes.get(s)
+        if code is None:
+            code = self._codes[s] = len(self._strings)
+            self._strings.append(s)
+        return code
+
+    def __len__(self) -> int:
+        return len(self._energy)
+
+    def append(self, rec: LedgerRecord) -> None:
+        i = len(self)
+        for col, (name, packed) in enumerate(zip(_DIGESTS, self._digests)):
+            value = getattr(rec, name)
+            raw = None
+            if len(value) == 64:
+                try:
+                    raw = bytes.fromhex(value)
+                except ValueError:
+                    pass
+            if raw is None or raw.hex() != value:
+                raw = bytes(32)
+                self._exceptions[col, i] = value
+            packed += raw
+        self._op_id.append(self._code(rec.op_id))
+        self._kind.append(self._code(rec.kind))
+        energy = rec.energy_delta
+        if type(energy) is not float:
+            self._exceptions["energy", i] = energy
+            energy = float(energy) if isinstance(energy, (int, float)) else 0.0
+        self._energy.append(energy)
+        for value in (rec.gauge, rec.metadata):
+            enc = bytearray()
+            encode_value(enc, value)
+            slot = self._payloads.slot(bytes(enc))[0]
+            if slot is None:
+                self._blobs += enc
+            self._refs.append(-1 if slot is None else slot)
+        self._blob_end.append(len(self._blobs))
+
+    def extend(self, recs: Iterable[LedgerRecord]) -> None:
+        for rec in recs:
+            self.append(rec)
+
+    def truncate(self, size: int) -> None:
+        """Drop the records from `size` on."""
+        for packed in self._digests:
+            del packed[32*size:]
+        for col in (self._op_id, self._kind, self._energy):
+            del col[size:]
+        del self._blobs[self._blob_end[size-1] if size else 0:], self._blob_end[size:]
+        del self._refs[2*size:]
+        self._exceptions = {k: v for k, v in self._exceptions.items() if k[1] < size}
+
+    def digest(self, name: str, i: int) -> str:
+        col = _DIGESTS.index(name)
+        odd = self._exceptions.get((col, i))
+        return odd if odd is not None else self._digests[col][32*i:32*i+32].hex()
+
+    def op_id(self, i: int) -> str:
+        return self._strings[self._op_id[i]]
+
+    def kind(self, i: int) -> str:
+        return self._strings[self._kind[i]]
+
+    def energy_delta(self, i: int) -> Any:
+        return self._exceptions.get(("energy", i), self._energy[i])
+
+    def payload(self, i: int) -> List[Any]:
+        pos = self._blob_end[i-1] if i else 0
+        out = []
+        for slot in self._refs[2*i:2*i+2]:
+            if slot < 0:
+                value, pos = decode_value(self._blobs, pos)
+            else:
+                value = decode_value(self._payloads[slot], 0)[0]
+            out.append(value)
+        return out
+
+    def __getitem__(self, i: int) -> LedgerRecord:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        gauge, metadata = self.payload(i)
+        return LedgerRecord(
+            op_id=self.op_id(i), kind=self.kind(i),
+            inputs_digest=self.digest("inputs_digest", i),
+            outputs_digest=self.digest("outputs_digest", i),
+            delta_signature=self.digest("delta_signature", i),
+            gauge=gauge, energy_delta=self.energy_delta(i), metadata=metadata,
+        )
+
+    def __iter__(self) -> Iterator[LedgerRecord]:
+        for i in range(len(self)):
+            yield self[i]
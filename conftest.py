@@ -0,0 +1,16 @@
+from onu_ledger import LedgerRecord, sha256
+import pytest
+
+@pytest.fixture
+def make_rec():
+    """``make_rec(i, **fields)``: the i-th record of a test ledger, with any field overridden."""
+    def make(i, **fields):
+        rec = dict(
+            op_id="codec:v1", kind="reversible",
+            inputs_digest=sha256(b"in%d" % i), outputs_digest=sha256(b"out%d" % i),
+            delta_signature=sha256(b"x"), gauge={"type": "integer-lifting"},
+            energy_delta=float(i), metadata={"ts": float(i)},
+        )
+        rec.update(fields)
+        return LedgerRecord(**rec)
+    return make
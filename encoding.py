@@ -0,0 +1,160 @@
+from __future__ import annotations
+from typing import Any, Optional, Tuple
+import json, struct
+
+# Canonical binary form of a LedgerRecord (version 1):
+#   0x01 | op_id | kind | inputs_digest | outputs_digest | delta_signature
+#        | energy_delta | gauge | metadata
+# Strings are <u32 length> + UTF-8. A digest that is 64 lowercase hex chars is
+# stored as b"h" + 32 raw bytes, anything else as b"s" + string. The remaining
+# fields use the tagged value encoding below; dict items are ordered by their
+# encoded keys so equal dicts always encode to the same bytes. Values follow
+# the JSON data model like digest_obj (string keys, str() for anything JSON
+# cannot hold), so a record survives an NDJSON round trip with its leaf.
+RECORD_V1 = 1
+
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+def _str(out: bytearray, s: str) -> None:
+    b = s.encode()
+    out += _U32.pack(len(b)); out += b
+
+def raw_digest(s: str) -> Optional[bytes]:
+    """The 32 raw bytes of a digest that is 64 lowercase hex chars, else None."""
+    if len(s) != 64:
+        return None
+    try:
+        raw = bytes.fromhex(s)
+    except ValueError:
+        return None
+    return raw if raw.hex() == s else None  # fromhex also takes upper case and spaces
+
+def _digest(out: bytearray, s: str) -> None:
+    raw = raw_digest(s)
+    if raw is not None:
+        out += b"h"; out += raw
+    else:
+        out += b"s"; _str(out, s)
+
+def json_key(k: Any) -> str:
+    """`k` as a JSON object key: str as is, the rest mapped the way json.dumps does."""
+    if type(k) is str:
+        return k
+    return json.dumps(k) if k is None or isinstance(k, (int, float)) else str(k)
+
+def _key(k: Any) -> bytes:
+    b = (k if type(k) is str else json_key(k)).encode()
+    return b"s" + _U32.pack(len(b)) + b
+
+def encode_value(out: bytearray, v: Any) -> None:
+    t = type(v)
+    if t is str:
+        b = v.encode()
+        out += b"s"; out += _U32.pack(len(b)); out += b
+    elif t is float:
+        out += b"d"; out += _F64.pack(v)
+    elif v is None:
+        out += b"N"
+    elif v is True:
+        out += b"T"
+    elif v is False:
+        out += b"F"
+    elif isinstance(v, dict):
+        enc = getattr(v, "_encoded", None)  # set on payloads a sealed store interned
+        if enc is not None:
+            out += enc
+            return
+        items = sorted((_key(k), x) for k, x in v.items())
+        out += b"m"; out += _U32.pack(len(items))
+        for kb, x in items:
+            out += kb; encode_value(out, x)
+    elif isinstance(v, str):
+        out += b"s"; _str(out, v)
+    elif isinstance(v, float):
+        out += b"d"; out += _F64.pack(v)
+    elif isinstance(v, int):
+        if -(1 << 63) <= v < 1 << 63:
+            out += b"i"; out += _I64.pack(v)
+        else:
+            b = v.to_bytes((v.bit_length() + 8) // 8, "little", signed=True)
+            out += b"I"; out += _U32.pack(len(b)); out += b
+    elif isinstance(v, (list, tuple)):
+        out += b"l"; out += _U32.pack(len(v))
+        for x in v:
+            encode_value(out, x)
+    else:  # same fallback as digest_obj's json default=str (bytes included)
+        out += b"s"; _str(out, str(v))
+
+def decode_value(buf: bytes, pos: int) -> Tuple[Any, int]:
+    tag = buf[pos:pos+1]; pos += 1
+    if tag == b"s":
+        (n,) = _U32.unpack_from(buf, pos); pos += 4
+        return buf[pos:pos+n].decode(), pos + n
+    if tag == b"d":
+        return _F64.unpack_from(buf, pos)[0], pos + 8
+    if tag == b"i":
+        return _I64.unpack_from(buf, pos)[0], pos + 8
+    if tag == b"N":
+        return None, pos
+    if tag == b"T":
+        return True, pos
+    if tag == b"F":
+        return False, pos
+    if tag == b"m":
+        (n,) = _U32.unpack_from(buf, pos); pos += 4
+        d = {}
+        for _ in range(n):
+            k, pos = decode_value(buf, pos)
+            d[k], pos = decode_value(buf, pos)
+        return d, pos
+    if tag == b"l":
+        (n,) = _U32.unpack_from(buf, pos); pos += 4
+        items = []
+        for _ in range(n):
+            x, pos = decode_value(buf, pos)
+            items.append(x)
+        return items, pos
+    if tag == b"I":
+        (n,) = _U32.unpack_from(buf, pos); pos += 4
+        return int.from_bytes(buf[pos:pos+n], "little", signed=True), pos + n
+    if tag == b"b":  # bytes, as written before values followed the JSON data model
+        (n,) = _U32.unpack_from(buf, pos); pos += 4
+        return bytes(buf[pos:pos+n]), pos + n
+    raise ValueError(f"bad value tag {tag!r} at {pos - 1}")
+
+def encode_record(rec: Any) -> bytes:
+    out = bytearray(b"\x01")
+    _str(out, rec.op_id)
+    _str(out, rec.kind)
+    _digest(out, rec.inputs_digest)
+    _digest(out, rec.outputs_digest)
+    _digest(out, rec.delta_signature)
+    encode_value(out, rec.energy_delta)
+    encode_value(out, rec.gauge)
+    encode_value(out, rec.metadata)
+    return bytes(out)
+
+def _read_str(buf: bytes, pos: int) -> Tuple[str, int]:
+    (n,) = _U32.unpack_from(buf, pos); pos += 4
+    return buf[pos:pos+n].decode(), pos + n
+
+def _read_digest(buf: bytes, pos: int) -> Tuple[str, int]:
+    if buf[pos:pos+1] == b"h":
+        return buf[pos+1:pos+33].hex(), pos + 33
+    return _read_str(buf, pos + 1)
+
+def decode_record(buf: bytes) -> Any:
+    from .ledger import LedgerRecord
+    if buf[:1] != b"\x01":
+        raise ValueError(f"unsupported record encoding {buf[:1]!r}")
+    op_id, pos = _read_str(buf, 1)
+    kind, pos = _read_str(buf, pos)
+    inputs, pos = _read_digest(buf, pos)
+    outputs, pos = _read_digest(buf, pos)
+    delta, pos = _read_digest(buf, pos)
+    energy, pos = decode_value(buf, pos)
+    gauge, pos = decode_value(buf, pos)
+    metadata, pos = decode_value(buf, pos)
+    return LedgerRecord(op_id, kind, inputs, outputs, delta, gauge, energy, metadata)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Optional, Tuple
+from .index import View
+
+def _append(tree: array, value: float) -> None:
+    # Fenwick append: node n covers (n - lowbit(n), n]
+    n = len(tree) + 1
+    tree.append(value + _prefix(tree, n - 1) - _prefix(tree, n - (n & -n)))
+
+def _prefix(tree: array, n: int) -> float:
+    # sum of the first n values
+    total = 0.0
+    while n > 0:
+        total += tree[n - 1]
+        n &= n - 1
+    return total
+
+class EnergySums(View):
+    """Fenwick trees of `energy_delta`, over all records and per `kind`.
+
+    An append costs O(log n) and any index-range total O(log n), so range
+    sums and residual checks never scan the records. A kind's tree runs over
+    that kind's records only, with their indices kept alongside to map a
+    global range onto it. Like `ColumnarRecords`, an energy_delta that is not
+    a number, or overflows a float, counts as 0.0 so `add` never fails.
+    """
+    name = "energy"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._tree = array("d")
+        self._kinds: Dict[str, Tuple[array, array]] = {}  # kind -> (record indices, tree)
+
+    def add(self, i: int, rec: Any) -> None:
+        value = rec.energy_delta
+        try:
+            value = float(value) if isinstance(value, (int, float)) else 0.0
+        except OverflowError:
+            value = 0.0
+        _append(self._tree, value)
+        where, tree = self._kinds.setdefault(rec.kind, (array("Q"), array("d")))
+        where.append(i)
+        _append(tree, value)
+        self.size = i + 1
+
+    def truncate(self, size: int, records: Any) -> bool:
+        # node n covers (n - lowbit(n), n], so a prefix of a Fenwick tree is one
+        del self._tree[size:]
+        for kind, (where, tree) in list(self._kinds.items()):
+            n = bisect_left(where, size)
+            del where[n:], tree[n:]
+            if not n:
+                del self._kinds[kind]
+        self.size = size
+        return True
+
+    def total(self, start: int = 0, stop: Optional[int] = None, kind: Optional[str] = None) -> float:
+        """Sum of energy_delta over records [start, stop), optionally of one kind."""
+        stop = self.size if stop is None else min(stop, self.size)
+        start = max(start, 0)
+        if start >= stop:
+            return 0.0
+        if kind is None:
+            return _prefix(self._tree, stop) - _prefix(self._tree, start)
+        if kind not in self._kinds:
+            return 0.0
+        where, tree = self._kinds[kind]
+        return _prefix(tree, bisect_left(where, stop)) - _prefix(tree, bisect_left(where, start))
+
+    def by_kind(self, start: int = 0, stop: Optional[int] = None) -> Dict[str, float]:
+        return {kind: self.total(start, stop, kind) for kind in self._kinds}
+
+    def residual(self, observed: float, start: int = 0, stop: Optional[int] = None,
+                 kind: Optional[str] = None) -> float:
+        """`observed` energy change minus what the ledger recorded over the range.
+
+        A ledger that accounts for every transfer has a residual of ~0.
+        """
+        return observed - self.total(start, stop, kind)
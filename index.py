@@ -0,0 +1,193 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Dict, List
+import json
+from .encoding import raw_digest
+
+class View:
+    """Structure derived from the record sequence and kept up to date on append.
+
+    `LedgerStore` calls ``add(i, rec)`` for every record in order, so ``size``
+    is always the number of records folded in. A durable store saves its
+    views next to the segments (see `dump_state`) and, on reopen, only
+    replays the records appended after the saved ``size``.
+    """
+    name = "view"
+    format = 1  # saved state of another format is rebuilt from the records
+
+    def __init__(self) -> None:
+        self.size = 0
+
+    def add(self, i: int, rec: Any) -> None:
+        self.size = i + 1
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def truncate(self, size: int, records: Any) -> bool:
+        """Forget the records from `size` on, still readable in `records`.
+
+        Returns False if the view cannot cut itself back and must be rebuilt.
+        """
+        return False
+
+    def dumps(self) -> bytes:
+        return dump_state(dict(self.__dict__, format=self.format))
+
+    def loads(self, data: bytes) -> None:
+        state = load_state(data)
+        if state.pop("format", 1) != self.format:
+            raise ValueError("view state of another format")
+        self.__dict__.update(state)
+
+# View state on disk is a JSON line followed by raw buffers, like the other
+# files of a segment store: arrays and bytes are written as their raw bytes
+# and referenced from the JSON by position, so loading one never runs code.
+
+def _pack(v: Any, blobs: List[bytes]) -> Any:
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, list):
+        return [_pack(x, blobs) for x in v]
+    if isinstance(v, tuple):
+        return {"tuple": [_pack(x, blobs) for x in v]}
+    if isinstance(v, array):
+        blobs.append(v.tobytes())
+        return {"array": v.typecode, "blob": len(blobs) - 1}
+    if isinstance(v, (bytes, bytearray)):
+        blobs.append(bytes(v))
+        return {"bytes": type(v) is bytearray, "blob": len(blobs) - 1}
+    if isinstance(v, dict):
+        # bytes keys of one width (digests) go into one buffer, the rest one by one
+        width = next((len(k) for k in v if type(k) is bytes), 0)
+        packed = [k for k in v if type(k) is bytes and len(k) == width] if width else []
+        others = [k for k in v if not (type(k) is bytes and len(k) == width)] if width else list(v)
+        blobs.append(b"".join(packed))
+        return {"dict": len(blobs) - 1, "width": width, "keys": [_pack(k, blobs) for k in others],
+                "values": [_pack(v[k], blobs) for k in packed + others]}
+    raise TypeError(f"cannot store {type(v).__name__} in view state")
+
+def _unpack(v: Any, blobs: List[bytes]) -> Any:
+    if isinstance(v, list):
+        return [_unpack(x, blobs) for x in v]
+    if not isinstance(v, dict):
+        return v
+    if "tuple" in v:
+        return tuple(_unpack(x, blobs) for x in v["tuple"])
+    if "array" in v:
+        out = array(v["array"])
+        out.frombytes(blobs[v["blob"]])
+        return out
+    if "bytes" in v:
+        raw = blobs[v["blob"]]
+        return bytearray(raw) if v["bytes"] else raw
+    raw, width = blobs[v["dict"]], v["width"]
+    keys = [raw[j:j+width] for j in range(0, len(raw), width)] if width else []
+    keys += [_unpack(k, blobs) for k in v["keys"]]
+    return dict(zip(keys, (_unpack(x, blobs) for x in v["values"])))
+
+def dump_state(state: Any) -> bytes:
+    """Serialize dicts, lists, tuples, scalars, bytes and arrays without pickle."""
+    blobs: List[bytes] = []
+    tree = _pack(state, blobs)
+    head = json.dumps({"state": tree, "blobs": [len(b) for b in blobs]}, separators=(",", ":"))
+    return head.encode() + b"\n" + b"".join(blobs)
+
+def load_state(data: bytes) -> Any:
+    """Inverse of `dump_state`; raises ValueError on anything it did not write."""
+    nl = data.find(b"\n")
+    if nl < 0:
+        raise ValueError("not view state")
+    try:
+        head = json.loads(data[:nl])
+        blobs, pos = [], nl + 1
+        for n in head["blobs"]:
+            blobs.append(data[pos:pos+n]); pos += n
+        if pos != len(data):
+            raise ValueError("view state has a bad length")
+        return _unpack(head["state"], blobs)
+    except (KeyError, TypeError, IndexError) as e:
+        raise ValueError(f"malformed view state: {e!r}") from None
+
+def _key(digest: str) -> Any:
+    # 64-char hex digests are keyed by their 32 raw bytes to halve the key size
+    raw = raw_digest(digest)
+    return digest if raw is None else raw
+
+def _push(table: Dict[Any, Any], key: Any, i: int) -> None:
+    # most digests belong to one record, so a bare int is stored until a second shows up
+    hit = table.get(key)
+    if hit is None:
+        table[key] = i
+    elif isinstance(hit, int):
+        table[key] = array("Q", (hit, i))
+    else:
+        hit.append(i)
+
+def _pop(table: Dict[Any, Any], key: Any, size: int, bare: bool) -> None:
+    # postings ascend, so the records from `size` on are a suffix of each
+    hit = table.get(key)
+    if hit is None or isinstance(hit, int):
+        if hit is not None and hit >= size:
+            del table[key]
+        return
+    while hit and hit[-1] >= size:
+        hit.pop()
+    if not hit:
+        del table[key]
+    elif bare and len(hit) == 1:
+        table[key] = hit[0]
+
+def _hits(hit: Any) -> List[int]:
+    if hit is None:
+        return []
+    return [hit] if isinstance(hit, int) else list(hit)
+
+class RecordIndex(View):
+    """Hash indexes on inputs/outputs digests and posting lists on op_id/kind."""
+    name = "index"
+    format = 2  # digests keyed by raw_digest
+    fields = ("inputs_digest", "outputs_digest", "op_id", "kind")
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._tables: Dict[str, Dict[Any, Any]] = {f: {} for f in self.fields}
+
+    def add(self, i: int, rec: Any) -> None:
+        t = self._tables
+        _push(t["inputs_digest"], _key(rec.inputs_digest), i)
+        _push(t["outputs_digest"], _key(rec.outputs_digest), i)
+        t["op_id"].setdefault(rec.op_id, array("Q")).append(i)
+        t["kind"].setdefault(rec.kind, array("Q")).append(i)
+        self.size = i + 1
+
+    def truncate(self, size: int, records: Any) -> bool:
+        t = self._tables
+        for i in range(size, self.size):
+            rec = records[i]
+            _pop(t["inputs_digest"], _key(rec.inputs_digest), size, True)
+            _pop(t["outputs_digest"], _key(rec.outputs_digest), size, True)
+            _pop(t["op_id"], rec.op_id, size, False)
+            _pop(t["kind"], rec.kind, size, False)
+        self.size = size
+        return True
+
+    def lookup(self, field: str, value: str) -> List[int]:
+        """Ascending indices of records whose `field` equals `value`."""
+        table = self._tables[field]
+        if field.endswith("_digest"):
+            return _hits(table.get(_key(value)))
+        return list(table.get(value, ()))
+
+    def count(self, field: str, value: str) -> int:
+        hit = self._tables[field].get(_key(value) if field.endswith("_digest") else value)
+        return 0 if hit is None else 1 if isinstance(hit, int) else len(hit)
+
+def intersect(postings: List[List[int]]) -> List[int]:
+    if not postings:
+        return []
+    postings = sorted(postings, key=len)
+    out = set(postings[0])
+    for p in postings[1:]:
+        out.intersection_update(p)
+    return sorted(out)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+class PayloadTable:
+    """Content-addressed table of gauge/metadata payloads that repeat.
+
+    Payloads are keyed by their canonical encoding and get a small integer
+    slot. A key is only admitted on its second sighting, so one-off payloads
+    (metadata carrying a timestamp, say) never occupy a slot; the candidates
+    seen once live in a bounded FIFO, and once `capacity` slots are taken
+    new payloads simply stay inline.
+    """
+
+    def __init__(self, capacity: int = 4096) -> None:
+        self.capacity = capacity
+        self._slots: Dict[bytes, int] = {}
+        self._values: List[Any] = []
+        self._once: Dict[bytes, None] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def slot(self, key: bytes, value: Any = None) -> Tuple[Optional[int], bool]:
+        """(slot of `key` or None, whether it was admitted by this call)."""
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot, False
+        if len(self._values) >= self.capacity:
+            return None, False
+        if key not in self._once:
+            self._once[key] = None
+            if len(self._once) > self.capacity:
+                del self._once[next(iter(self._once))]
+            return None, False
+        self._once.pop(key, None)
+        slot = self._slots[key] = len(self._values)
+        self._values.append(key if value is None else value)
+        return slot, True
+
+    def __getitem__(self, slot: int) -> Any:
+        return self._values[slot]
@@ -1,7 +1,22 @@
 from __future__ import annotations
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Any
-import hashlib, json, time
+from dataclasses import dataclass, asdict, fields
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from bisect import bisect_right
+from itertools import islice
+from collections import deque
+import gzip, hashlib, io, json, lzma, os, threading, time
+from contextlib import contextmanager
+from .merkle import MerkleTree, merkle_root_parallel
+from .encoding import encode_record, encode_value, json_key
+from .intern import PayloadTable
+from .index import View, RecordIndex, intersect
+from .lineage import LineageGraph
+
+# Leaf hash versions: LEAF_JSON is the original digest_obj(asdict(record));
+# LEAF_BINARY hashes encoding.encode_record, whose leading version byte keeps
+# the two leaf spaces apart.
+LEAF_JSON = 0
+LEAF_BINARY = 1
 
 def sha256(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
@@ -33,26 +48,717 @@ class LedgerRecord:
     energy_delta: float = 0.0
     metadata: Dict[str, Any] = None
 
+class _FrozenDict(dict):
+    def _readonly(self, *args: Any, **kw: Any) -> None:
+        raise TypeError("sealed record payloads are read-only")
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _readonly  # type: ignore
+
+    def __deepcopy__(self, memo: Any) -> "_FrozenDict":
+        return self
+
+    def __reduce__(self) -> Any:
+        return (_FrozenDict, (dict(self),))
+
+def _freeze(v: Any) -> Any:
+    if isinstance(v, dict):
+        return _FrozenDict((k, _freeze(x)) for k, x in v.items())
+    if isinstance(v, (list, tuple)):
+        return tuple(_freeze(x) for x in v)
+    return v
+
+def _json_keys(v: Any) -> Any:
+    # str keys throughout, mapped like encoding's, so json.dumps can sort them
+    if isinstance(v, dict):
+        return {json_key(k): _json_keys(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_json_keys(x) for x in v]
+    return v
+
+def _thaw(v: Any) -> Any:
+    if isinstance(v, dict):
+        return {k: _thaw(x) for k, x in v.items()}
+    if isinstance(v, tuple):
+        return [_thaw(x) for x in v]
+    return v
+
+@dataclass(frozen=True)
+class SealedRecord:
+    """Immutable copy of a LedgerRecord that carries its own leaf digest.
+
+    Built by `seal`; gauge/metadata become read-only dicts and lists become
+    tuples, so the cached leaf can never drift from the record's contents.
+    """
+    op_id: str
+    kind: str
+    inputs_digest: str
+    outputs_digest: str
+    delta_signature: str
+    gauge: Dict[str, Any]
+    energy_delta: float = 0.0
+    metadata: Dict[str, Any] = None
+
+    @property
+    def leaf(self) -> bytes:
+        return self._leaf
+
+    def thaw(self) -> LedgerRecord:
+        """A mutable LedgerRecord with plain dicts and lists again."""
+        return LedgerRecord(**{f.name: _thaw(getattr(self, f.name)) for f in fields(self)})
+
+def _intern(value: Any, payloads: PayloadTable) -> Any:
+    # frozen payloads are safe to share; the shared copy caches its encoding
+    if not isinstance(value, dict):
+        return value
+    enc = bytearray()
+    encode_value(enc, value)
+    slot, new = payloads.slot(bytes(enc), value)
+    if slot is None:
+        return value
+    if new:
+        value._encoded = bytes(enc)
+    return payloads[slot]
+
+def seal(rec: Any, version: int = LEAF_BINARY, payloads: Optional[PayloadTable] = None) -> SealedRecord:
+    if isinstance(rec, SealedRecord) and rec._leaf_version == version:
+        return rec
+    out = SealedRecord(**{f.name: _freeze(getattr(rec, f.name)) for f in fields(SealedRecord)})
+    if payloads is not None:
+        object.__setattr__(out, "gauge", _intern(out.gauge, payloads))
+        object.__setattr__(out, "metadata", _intern(out.metadata, payloads))
+    object.__setattr__(out, "_leaf", leaf_digest(out, version))
+    object.__setattr__(out, "_leaf_version", version)
+    return out
+
+def leaf_digest(rec: Any, version: int = LEAF_BINARY, cached: bool = True) -> bytes:
+    # cached=False rehashes a SealedRecord from its contents, trusting neither
+    # `_leaf` nor the encodings cached on its interned payloads
+    if isinstance(rec, SealedRecord):
+        if not cached:
+            rec = rec.thaw()
+        elif getattr(rec, "_leaf_version", None) == version:
+            return rec._leaf
+    if version == LEAF_BINARY:
+        return hashlib.sha256(encode_record(rec)).digest()
+    if version == LEAF_JSON:
+        return bytes.fromhex(digest_obj(asdict(rec)))
+    raise ValueError(f"unknown leaf version {version}")
+
+def _leaf_chunk(recs: List[Any], version: int, cached: bool = True) -> bytes:
+    return b"".join(leaf_digest(r, version, cached) for r in recs)
+
+def leaf_digests(recs: List[Any], version: int = LEAF_BINARY, executor: Any = None,
+                 chunk: int = 8192, cached: bool = True) -> bytes:
+    """Leaf digests of `recs` packed as 32-byte chunks, hashed on `executor` if given."""
+    if executor is None:
+        return _leaf_chunk(recs, version, cached)
+    parts = [recs[i:i+chunk] for i in range(0, len(recs), chunk)]
+    return b"".join(executor.map(_leaf_chunk, parts, [version] * len(parts), [cached] * len(parts)))
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A committed state: the first `size` records under `root`, the
+    `commits`-th committed root. Everything it names is immutable, so
+    readers can use it without taking the store's lock."""
+    size: int
+    root: str
+    commits: int
+
+class _Pending:
+    __slots__ = ("rec", "leaf", "index")
+
+    def __init__(self, rec: Any, leaf: bytes) -> None:
+        self.rec, self.leaf, self.index = rec, leaf, None
+
+NDJSON_FORMAT = "onu-ledger-ndjson"
+
+@contextmanager
+def _ndjson_stream(fp: Any, mode: str, compress: Optional[str] = None) -> Iterator[Any]:
+    """Binary stream over `fp`, a path or a binary file object.
+
+    Reading sniffs gzip/xz magic bytes; writing compresses when asked to or
+    when the path ends in .gz/.xz. A file object passed in is left open.
+    """
+    opened = isinstance(fp, (str, bytes, os.PathLike))
+    if opened and mode == "wb" and compress is None:
+        name = os.fsdecode(fp)
+        compress = "gzip" if name.endswith(".gz") else "xz" if name.endswith(".xz") else None
+    base = open(fp, mode) if opened else fp
+    peekable = None
+    stream = base
+    try:
+        if mode == "rb":
+            if not hasattr(base, "peek"):
+                peekable = stream = io.BufferedReader(base)
+            head = stream.peek(6)[:6]
+            if head[:2] == b"\x1f\x8b":
+                stream = gzip.GzipFile(fileobj=stream, mode="rb")
+            elif head == b"\xfd7zXZ\x00":
+                stream = lzma.LZMAFile(stream, mode="rb")
+        elif compress == "gzip":
+            stream = gzip.GzipFile(fileobj=base, mode="wb")
+        elif compress in ("xz", "lzma"):
+            stream = lzma.LZMAFile(base, mode="wb")
+        elif compress is not None:
+            raise ValueError(f"unknown compression {compress!r}")
+        yield stream
+    finally:
+        if stream is not base and stream is not peekable:
+            stream.close()  # flushes the compressor; never closes the file under it
+        if peekable is not None:
+            peekable.detach()
+        if opened:
+            base.close()
+
 class LedgerStore:
-    def __init__(self) -> None:
-        self._records: List[LedgerRecord] = []
+    def __init__(self, backend: Any = None, leaf_version: int = LEAF_BINARY, sealed: bool = False,
+                 records: Any = None, views: Iterable[View] = (), checkpoint_every: int = 0,
+                 concurrent: bool = False, mode: str = "tree") -> None:
+        # `backend` is any list-like record sequence that also keeps the
+        # committed roots (see storage.SegmentStore); without one, records are
+        # kept in memory in `records` (a list, or e.g. columnar.ColumnarRecords).
+        # `sealed` stores appended records as SealedRecords (see `seal`),
+        # sharing one frozen copy of every gauge/metadata payload that repeats.
+        # `views` are kept up to date on append and found by name in
+        # `self.views` (e.g. RecordIndex for `find`, TimeIndex for `between`).
+        # With a backend, `checkpoint_every` writes a checkpoint from
+        # commit_root once that many records have arrived.
+        # `concurrent` routes append through a combining sequencer: callers
+        # queue records and whichever holds the lock writes the whole queue
+        # as one batch, handing out indices in queue order. `mode` is "tree"
+        # (roots as `merkle_root`) or "mmr" (a Merkle Mountain Range: roots
+        # bag the peaks, so a record's path to its peak never goes stale).
+        self._backend = backend
+        self.sealed = sealed
+        self._payloads = PayloadTable() if sealed else None
+        if backend is not None:
+            # a backend fixes its leaf version when first used; older ones predate it
+            if "leaf_version" not in backend.meta:
+                backend.meta["leaf_version"] = leaf_version if not len(backend) else LEAF_JSON
+                backend.save_meta()
+            leaf_version = backend.meta["leaf_version"]
+            if "mode" not in backend.meta and not len(backend):
+                backend.meta["mode"] = mode
+                backend.save_meta()
+            mode = backend.meta.get("mode", "tree")
+        if mode not in ("tree", "mmr"):
+            raise ValueError(f"unknown mode {mode!r}")
+        self.leaf_version = leaf_version
+        self.mode = mode
+        if backend is not None:
+            records = backend
+        self._records: List[LedgerRecord] = [] if records is None else records
         self._roots: List[str] = []
+        self._sizes: List[int] = []
+        self._tree = MerkleTree()
+        self._lock = threading.Lock()
+        self._commit_lock = threading.RLock()  # keeps roots and checkpoints on disk in commit order
+        self.checkpoint_every = checkpoint_every
+        self._ckpt: Dict[str, Any] = {}
+        if backend is not None:
+            self._ckpt = self._load_checkpoint()
+            start = self._ckpt.get("size", 0)
+            if start:
+                self._tree = MerkleTree.from_peaks(start, [bytes.fromhex(p) for p in self._ckpt["peaks"]])
+            for i in range(start, len(backend)):
+                self._tree.append(leaf_digest(backend[i], leaf_version))
+            # roots before the checkpoint were verified when it was written; later
+            # ones may name records that never became durable before a crash
+            for size, root in backend.roots():
+                if size < start or size <= len(self._tree) and self._root(size).hex() == root:
+                    self._sizes.append(size); self._roots.append(root)
+        self._views: List[View] = []
+        self.views: Dict[str, View] = {}
+        for view in sorted(views, key=lambda v: isinstance(v, LineageGraph)):
+            if isinstance(view, LineageGraph) and view.index is None:
+                view.index = self.views.get("index") or self._attach(RecordIndex())
+            self._attach(view)
+        self.concurrent = concurrent
+        self._queue: deque = deque()
+        self._snapshot = Snapshot(self._sizes[-1], self._roots[-1], len(self._roots)) if self._roots else None
+
+    def _root(self, size: int) -> bytes:
+        return self._tree.mmr_root(size) if self.mode == "mmr" else self._tree.root(size)
+
+    def snapshot(self) -> Optional[Snapshot]:
+        """The latest committed state, or None before the first commit."""
+        return self._snapshot
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    def get(self, index: int) -> Any:
+        return self._records[index]
+
+    def _attach(self, view: View) -> Any:
+        """Register `view`, restoring its saved state and replaying newer records."""
+        if view.name in self.views:
+            raise ValueError(f"two views named {view.name!r}")
+        if self._backend is not None:
+            data = self._backend.read_file(view.name + ".view")
+            saved = self._ckpt.get("views", {}).get(view.name)
+            if data is not None and saved is not None and sha256(data) == saved["sha256"]:
+                try:
+                    view.loads(data)
+                except ValueError:  # e.g. written by an older version: rebuild it
+                    view.reset()
+        for i in range(view.size, len(self._records)):
+            view.add(i, self._records[i])
+        self._views.append(view)
+        self.views[view.name] = view
+        return view
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        data = self._backend.read_file("checkpoint.json")
+        if data is None:
+            return {}
+        ckpt = json.loads(data)
+        if ckpt.get("leaf_version") != self.leaf_version or ckpt["size"] > len(self._backend):
+            return {}
+        return ckpt
+
+    def checkpoint(self) -> None:
+        """Persist the Merkle frontier, new leaf digests and view state.
+
+        Reopening then restores the tree from the frontier and replays only
+        the records appended after this call. The leaf digests are kept so
+        proofs into older history can rebuild the full tree without
+        rehashing records; the checkpoint file itself is written last.
+        """
+        if self._backend is None:
+            return
+        with self._commit_lock:
+            with self._lock:
+                n = len(self._tree)
+                persisted = self._ckpt.get("leaves", 0)
+                if persisted < self._tree._base[0]:
+                    self._hydrate()
+                leaves = self._tree.leaves(persisted, n)
+                peaks = self._tree.peaks(n)
+                views = {v.name: (v.size, v.dumps()) for v in self._views}
+            self._backend.sync(n)
+            self._backend.write_at("leaves", 32 * persisted, leaves)
+            for name, (_, data) in views.items():
+                self._backend.write_file(name + ".view", data)
+            ckpt = {
+                "size": n,
+                "peaks": [p.hex() for p in peaks],
+                "leaf_version": self.leaf_version,
+                "leaves": n,
+                "views": {name: {"size": size, "sha256": sha256(data)} for name, (size, data) in views.items()},
+            }
+            self._backend.write_file("checkpoint.json", json.dumps(ckpt, sort_keys=True).encode())
+            self._ckpt = ckpt
+
+    def _hydrate(self) -> MerkleTree:
+        """The full tree, rebuilding history pruned by a checkpoint restore."""
+        tree = self._tree
+        if tree.partial:
+            base = tree._base[0]
+            data = self._backend.read_file("leaves") or b""
+            have = min(len(data) // 32, base)
+            v = self.leaf_version
+            tree.hydrate(data[:32*have] + b"".join(leaf_digest(self._records[i], v) for i in range(have, base)))
+        return tree
+
+    @classmethod
+    def open(cls, path: str, **kw: Any) -> "LedgerStore":
+        """Open (or create) a segment-file ledger; storage options go to SegmentStore."""
+        from .storage import SegmentStore
+        storage = {k: kw.pop(k) for k in ("segment_bytes", "sync") if k in kw}
+        return cls(SegmentStore(path, **storage), **kw)
+
+    def close(self) -> None:
+        if self._backend is not None:
+            self.checkpoint()
+            self._backend.close()
+
+    def _write(self, chunk: List[Any], packed: bytes) -> int:
+        # caller holds self._lock
+        first = len(self._tree)
+        if self._backend is None:
+            self._records.extend(chunk)
+        else:
+            self._backend.write_many(chunk)
+        self._tree.extend(packed[i:i+32] for i in range(0, len(packed), 32))
+        for view in self._views:
+            for i, r in enumerate(chunk, first):
+                view.add(i, r)
+        return first
 
     def append(self, rec: LedgerRecord) -> int:
-        self._records.append(rec)
-        return len(self._records) - 1
+        if self.sealed:
+            rec = seal(rec, self.leaf_version, self._payloads)
+        leaf = leaf_digest(rec, self.leaf_version)
+        if self.concurrent:
+            return self._sequence(_Pending(rec, leaf))
+        with self._lock:
+            if self._backend is None:
+                self._records.append(rec)
+            else:
+                self._backend.write(rec)
+            index = self._tree.append(leaf)
+            for view in self._views:
+                view.add(index, rec)
+        if self._backend is not None:
+            self._backend.persist(index + 1)  # outside the lock so appenders share fsyncs
+        return index
+
+    def _sequence(self, item: _Pending) -> int:
+        self._queue.append(item)
+        with self._lock:
+            if item.index is None:  # nobody drained the queue for us: drain it ourselves
+                batch = []
+                while self._queue:
+                    batch.append(self._queue.popleft())
+                first = self._write([p.rec for p in batch], b"".join(p.leaf for p in batch))
+                for i, p in enumerate(batch, first):
+                    p.index = i
+        if self._backend is not None:
+            self._backend.persist(item.index + 1)
+        return item.index
+
+    def append_many(self, recs: Iterable[Any], commit: bool = False,
+                    batch: int = 4096, executor: Any = None) -> Tuple[int, int, Optional[str]]:
+        """Append records (or tuples of LedgerRecord fields) from any iterable.
+
+        Leaves are hashed a batch at a time, on `executor` if one is given,
+        and each batch reaches the records or backend in one call. Returns
+        ``(start, stop, root)``, where `root` is the new committed root if
+        `commit` is set and None otherwise.
+        """
+        it = iter(recs)
+        start = None
+        v = self.leaf_version
+        while True:
+            chunk = [r if isinstance(r, (LedgerRecord, SealedRecord)) else LedgerRecord(*r)
+                     for r in islice(it, batch)]
+            if not chunk:
+                break
+            if self.sealed:
+                chunk = [seal(r, v, self._payloads) for r in chunk]
+            packed = leaf_digests(chunk, v, executor)
+            with self._lock:
+                first = self._write(chunk, packed)
+            start = first if start is None else start
+        with self._lock:
+            stop = len(self._tree)
+        if self._backend is not None:
+            self._backend.persist(stop)
+        return (stop if start is None else start), stop, (self.commit_root() if commit else None)
 
     def commit_root(self) -> str:
-        root = merkle_root([digest_obj(asdict(r)) for r in self._records])
-        self._roots.append(root)
+        with self._commit_lock:
+            with self._lock:
+                size = len(self._tree)
+                root = self._root(size).hex()
+                self._roots.append(root)
+                self._sizes.append(size)
+                self._snapshot = Snapshot(size, root, len(self._roots))
+            if self._backend is not None:
+                self._backend.add_root(size, root)
+                if self.checkpoint_every and size - self._ckpt.get("size", 0) >= self.checkpoint_every:
+                    self.checkpoint()
         return root
 
-    def proof_of_inclusion(self, index: int) -> Dict[str, Any]:
+    def _reader_tree(self) -> MerkleTree:
+        # Readers only touch complete nodes below a snapshot's size, which never
+        # change, so they need the lock only for the one-off hydration.
+        if self._tree.partial:
+            with self._lock:
+                self._hydrate()
+        return self._tree
+
+    def proof_of_inclusion(self, index: int, snapshot: Optional[Snapshot] = None) -> Dict[str, Any]:
+        snap = snapshot or self._snapshot
+        assert snap is not None, "no committed root"
+        size = snap.size
+        tree = self._reader_tree()
+        extra: Dict[str, Any] = {}
+        if self.mode == "mmr":
+            path, peak = tree.mmr_path(index, size)
+            extra = {"mode": "mmr", "peak": peak, "peaks": [p.hex() for p in tree.peaks(size)]}
+        else:
+            path = tree.audit_path(index, size)
+        rec = self._records[index]
+        if leaf_digest(rec, self.leaf_version) != tree.leaf(index):
+            raise ValueError(f"record {index} was modified after append")
+        return {
+            "index": index,
+            "size": size,
+            "root": snap.root,
+            "leaf": tree.leaf(index).hex(),
+            "path": [[sib.hex(), "L" if left else "R"] for sib, left in path],
+            "record": asdict(rec),
+            **extra,
+        }
+
+    def multiproof(self, indices: Iterable[int], snapshot: Optional[Snapshot] = None) -> Dict[str, Any]:
+        """One proof for many records: their leaves plus deduplicated siblings.
+
+        Check it with ``verify_multiproof(proof["leaves"], proof, root)``.
+        """
+        snap = snapshot or self._snapshot
+        assert snap is not None, "no committed root"
+        indices = sorted(set(indices))
+        tree = self._reader_tree()
+        path = tree.multiproof(indices, snap.size, mmr=self.mode == "mmr")
+        leaves = [tree.leaf(i) for i in indices]
+        v = self.leaf_version
+        for i, leaf in zip(indices, leaves):
+            if leaf_digest(self._records[i], v) != leaf:
+                raise ValueError(f"record {i} was modified after append")
+        return {
+            "indices": indices,
+            "size": snap.size,
+            "root": snap.root,
+            "leaves": [leaf.hex() for leaf in leaves],
+            "path": [p.hex() for p in path],
+            **({"mode": "mmr"} if self.mode == "mmr" else {}),
+        }
+
+    def consistency_proof(self, first: int, second: int = -1) -> Dict[str, Any]:
+        """Prove that committed root `second` extends committed root `first`."""
+        snap = self._snapshot
+        assert snap is not None, "no committed root"
+        roots, sizes = self._roots[:snap.commits], self._sizes[:snap.commits]
+        m, n = sizes[first], sizes[second]
+        tree = self._reader_tree()
+        if self.mode == "mmr":
+            peaks, path = tree.mmr_consistency_proof(m, n)
+        else:
+            peaks, path = tree.consistency_proof(m, n)
+        return {
+            "first_size": m,
+            "second_size": n,
+            "first_root": roots[first],
+            "second_root": roots[second],
+            "peaks": [p.hex() for p in peaks],
+            "path": [p.hex() for p in path],
+            **({"mode": "mmr"} if self.mode == "mmr" else {}),
+        }
+
+    def find(self, **where: str) -> List[int]:
+        """Indices of records matching every ``field=value`` given.
+
+        With a `RecordIndex` view the fields it indexes (inputs_digest,
+        outputs_digest, op_id, kind) are looked up and any others checked on
+        the hits; otherwise, or with no indexed field given, this scans.
+        """
+        index = self.views.get("index")
+        indexed = [f for f in where if f in RecordIndex.fields] if index is not None else []
+        if indexed:
+            hits = intersect([index.lookup(f, where[f]) for f in indexed])
+            rest = [(f, v) for f, v in where.items() if f not in indexed]
+            return [i for i in hits if all(getattr(self._records[i], f) == v for f, v in rest)]
+        return [i for i, r in enumerate(self._records)
+                if all(getattr(r, f) == v for f, v in where.items())]
+
+    def between(self, t0: Optional[float] = None, t1: Optional[float] = None) -> Iterator[Tuple[int, Any]]:
+        """``(index, record)`` for every record with ``t0 <= ts < t1``, in order."""
+        assert "time" in self.views, "needs a TimeIndex view"
+        start, stop = self.views["time"].span(t0, t1)
+        for i in range(start, stop):
+            yield i, self._records[i]
+
+    def root_at(self, t: float) -> Tuple[int, str]:
+        """``(size, root)`` of the ledger as it stood at time `t`."""
+        assert "time" in self.views, "needs a TimeIndex view"
+        size = min(self.views["time"].size_at(t), len(self._tree))
+        self._reader_tree()
+        return size, self._root(size).hex()
+
+    def energy_between(self, t0: Optional[float] = None, t1: Optional[float] = None,
+                       kind: Optional[str] = None) -> float:
+        """Sum of energy_delta over the records with ``t0 <= ts < t1``."""
+        assert "time" in self.views and "energy" in self.views, "needs TimeIndex and EnergySums views"
+        return self.views["energy"].total(*self.views["time"].span(t0, t1), kind=kind)
+
+    def seen(self, digest: str) -> bool:
+        """Whether any record has `digest` as its inputs or outputs digest.
+
+        An index answers exactly and faster than a filter. Without one, a
+        Bloom filter turns most misses away before the records are scanned;
+        hits (and false positives) are confirmed by the scan.
+        """
+        index, bloom = self.views.get("index"), self.views.get("bloom")
+        if index is not None:
+            return bool(index.count("inputs_digest", digest) or index.count("outputs_digest", digest))
+        if bloom is not None and not bloom.might_contain(digest):
+            return False
+        return any(r.inputs_digest == digest or r.outputs_digest == digest for r in self._records)
+
+    def audit(self, executor: Any = None, workers: Optional[int] = None, batch: int = 1 << 16) -> bool:
+        """Rehash every record from scratch and check the latest committed root.
+
+        Leaf hashing runs on `executor` when given and the tree is rebuilt with
+        `merkle_root_parallel`, so a full audit can use every core. Records
+        are read `batch` at a time; only their 32-byte leaves are kept.
+        """
         assert self._roots, "no committed root"
-        return {"index": index, "root": self._roots[-1], "record": asdict(self._records[index])}
+        size = self._sizes[-1]
+        packed = bytearray()
+        for start in range(0, size, batch):
+            recs = [self._records[i] for i in range(start, min(start + batch, size))]
+            packed += leaf_digests(recs, self.leaf_version, executor, cached=False)
+        if self.mode == "mmr":
+            tree = MerkleTree()
+            tree.extend(packed[i:i+32] for i in range(0, len(packed), 32))
+            return tree.mmr_root().hex() == self._roots[-1]
+        return merkle_root_parallel(packed, workers=workers, executor=executor) == self._roots[-1]
+
+    def modified_records(self) -> List[int]:
+        """Indices of records whose contents no longer match their leaf."""
+        v = self.leaf_version
+        with self._lock:
+            tree = self._hydrate()
+        return [i for i, r in enumerate(self._records) if leaf_digest(r, v, cached=False) != tree.leaf(i)]
+
+    def truncate(self, size: int) -> None:
+        """Drop the records from `size` on, with every root that covers them.
+
+        Views cut themselves back where they can (see `View.truncate`) and
+        are otherwise rebuilt from the kept records; a durable store writes a
+        fresh checkpoint if its old one reached past `size`.
+        """
+        with self._commit_lock:
+            with self._lock:
+                if not 0 <= size <= len(self._tree):
+                    raise IndexError(size)
+                if size < self._tree._base[0]:
+                    self._hydrate()
+                rebuild = [v for v in self._views if v.size > size and not v.truncate(size, self._records)]
+                if self._backend is not None:
+                    self._backend.truncate(size)
+                elif isinstance(self._records, list):
+                    del self._records[size:]
+                else:
+                    self._records.truncate(size)
+                self._tree.truncate(size)
+                keep = bisect_right(self._sizes, size)
+                del self._roots[keep:], self._sizes[keep:]
+                self._snapshot = Snapshot(self._sizes[-1], self._roots[-1], keep) if keep else None
+                for view in rebuild:
+                    view.reset()
+                    for i in range(size):
+                        view.add(i, self._records[i])
+                stale = self._ckpt.get("size", 0) > size
+                if stale:
+                    self._ckpt = {"leaves": min(self._ckpt.get("leaves", 0), size)}
+            if stale:
+                self.checkpoint()
+
+    def export_ndjson(self, fp: Any, compress: Optional[str] = None,
+                      snapshot: Optional[Snapshot] = None) -> None:
+        """Stream the ledger as one JSON object per line with bounded memory.
+
+        A header line is followed by ``{"record": ...}`` lines, with each
+        committed root written as ``{"root": ..., "size": n}`` right after its
+        n-th record. Gauge/metadata payloads that repeat are written once as
+        ``{"payload": slot, "value": ...}`` and then referenced from the
+        record's ``"ref"`` map. `compress` is "gzip", "xz" or None. With a
+        `snapshot` only the state it names is written, without blocking writers.
+        """
+        if snapshot is not None:
+            n, c = snapshot.size, snapshot.commits
+            roots = list(zip(self._sizes[:c], self._roots[:c]))
+        else:
+            with self._lock:
+                n, roots = len(self._tree), list(zip(self._sizes, self._roots))
+        with _ndjson_stream(fp, "wb", compress) as out:
+            out.write(json.dumps({"format": NDJSON_FORMAT, "leaf_version": self.leaf_version, "mode": self.mode}).encode() + b"\n")
+            for line in self._lines(0, n, roots):
+                out.write(line)
+
+    def _lines(self, start: int, stop: int, roots: List[Tuple[int, str]]) -> Iterator[bytes]:
+        # record lines [start, stop), each of `roots` right after its last record;
+        # a repeated gauge/metadata payload goes out once as {"payload": slot,
+        # "value": ...} and later records name it in their "ref" map
+        payloads = PayloadTable()
+        pending = iter(roots)
+        nxt = next(pending, None)
+        for i in range(start, stop + 1):
+            while nxt is not None and nxt[0] == i:
+                yield json.dumps({"root": nxt[1], "size": nxt[0]}).encode() + b"\n"
+                nxt = next(pending, None)
+            if i < stop:
+                rec, refs = asdict(self._records[i]), {}
+                for name in ("gauge", "metadata"):
+                    try:
+                        value = json.dumps(rec[name], sort_keys=True, default=str).encode()
+                    except TypeError:  # keys of mixed types do not sort
+                        rec[name] = _json_keys(rec[name])
+                        value = json.dumps(rec[name], sort_keys=True, default=str).encode()
+                    slot, new = payloads.slot(value)
+                    if slot is not None:
+                        if new:
+                            yield b'{"payload": %d, "value": %s}\n' % (slot, value)
+                        refs[name] = slot
+                        del rec[name]
+                line = {"record": rec, "ref": refs} if refs else {"record": rec}
+                yield json.dumps(line, sort_keys=True, default=str).encode() + b"\n"
+
+    def import_ndjson(self, fp: Any, batch: int = 4096) -> int:
+        """Append every record of an `export_ndjson` stream (plain, gzip or xz).
+
+        Each committed root is re-derived from the records read so far and
+        re-committed only if it matches, so a corrupt or forged stream fails
+        at the first bad root with ValueError. Returns the record count.
+        """
+        if len(self._tree):
+            raise ValueError("import_ndjson needs an empty store")
+        with _ndjson_stream(fp, "rb") as src:
+            self._ingest(src, batch)
+        return len(self._tree)
+
+    def _ingest(self, lines: Iterable[bytes], batch: int) -> None:
+        # append the record/root lines of `_lines`, stopping at an {"end": n} line
+        buf: List[LedgerRecord] = []
+        payloads: Dict[int, str] = {}
+        for lineno, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if "record" in obj:
+                rec = obj["record"]
+                for name, slot in obj.get("ref", {}).items():
+                    rec[name] = json.loads(payloads[slot])  # a fresh copy per record
+                buf.append(LedgerRecord(**rec))
+                if len(buf) >= batch:
+                    self.append_many(buf); buf = []
+            elif "root" in obj:
+                if buf:
+                    self.append_many(buf); buf = []
+                size = obj["size"]
+                if size != len(self._tree) or self._root(size).hex() != obj["root"]:
+                    raise ValueError(f"line {lineno}: root {obj['root']} does not match the records")
+                self.commit_root()
+            elif "payload" in obj:
+                payloads[obj["payload"]] = json.dumps(obj["value"])
+            elif obj.get("format") == NDJSON_FORMAT:
+                self._set_meta("leaf_version", obj.get("leaf_version", LEAF_JSON))
+                self._set_meta("mode", obj.get("mode", "tree"))
+            elif "end" in obj:
+                break
+            else:
+                raise ValueError(f"line {lineno}: not a ledger line")
+        if buf:
+            self.append_many(buf)
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        # leaf_version and mode are fixed once the store holds records
+        if value == getattr(self, key):
+            return
+        if len(self._tree):
+            raise ValueError(f"cannot change the {key} of a non-empty store")
+        setattr(self, key, value)
+        if self._backend is not None:
+            self._backend.meta[key] = value
+            self._backend.save_meta()
 
     def export_json(self) -> Dict[str, Any]:
         return {
             "records": [asdict(r) for r in self._records],
             "roots": self._roots,
+            "leaf_version": self.leaf_version,
+            "mode": self.mode,
         }
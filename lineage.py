@@ -0,0 +1,108 @@
+from __future__ import annotations
+from collections import deque
+from heapq import heapify, heappop, heappush
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from .index import View, RecordIndex, _key
+
+class LineageGraph(View):
+    """Provenance DAG: record i -> j whenever i's outputs_digest is j's inputs_digest.
+
+    Edges are never materialised; they are answered from the digest tables of
+    a shared `RecordIndex` plus two packed digest columns, so an append costs
+    O(1) and a traversal costs O(size of the lineage it returns).
+    """
+    name = "lineage"
+    format = 2  # digests keyed by raw_digest
+
+    def __init__(self, index: Optional[RecordIndex] = None) -> None:
+        super().__init__()
+        self.index = index
+        self._digests = (bytearray(), bytearray())  # inputs, outputs; 32 bytes per record
+        self._odd: Dict[Any, str] = {}  # (column, i) -> digest that is not 64-char hex
+
+    def reset(self) -> None:
+        self.__init__(self.index)
+
+    def dumps(self) -> bytes:
+        index, self.index = self.index, None  # the index persists itself
+        try:
+            return super().dumps()
+        finally:
+            self.index = index
+
+    def loads(self, data: bytes) -> None:
+        index = self.index
+        super().loads(data)
+        self.index = index
+
+    def add(self, i: int, rec: Any) -> None:
+        for col, digest in enumerate((rec.inputs_digest, rec.outputs_digest)):
+            key = _key(digest)
+            if not isinstance(key, bytes):
+                self._odd[col, i] = digest
+                key = bytes(32)
+            self._digests[col].extend(key)
+        self.size = i + 1
+
+    def truncate(self, size: int, records: Any) -> bool:
+        for col, digests in enumerate(self._digests):
+            del digests[32*size:]
+            for i in range(size, self.size):
+                self._odd.pop((col, i), None)
+        self.size = size
+        return True
+
+    def _digest(self, col: int, i: int) -> str:
+        odd = self._odd.get((col, i))
+        return odd if odd is not None else self._digests[col][32*i:32*i+32].hex()
+
+    def parents(self, i: int) -> List[int]:
+        return [j for j in self.index.lookup("outputs_digest", self._digest(0, i)) if j != i]
+
+    def children(self, i: int) -> List[int]:
+        return [j for j in self.index.lookup("inputs_digest", self._digest(1, i)) if j != i]
+
+    def _walk(self, starts: Iterable[int], step: Any, depth: Optional[int]) -> List[int]:
+        seen = set(starts)
+        order: List[int] = []
+        queue = deque((i, 0) for i in seen)
+        while queue:
+            i, d = queue.popleft()
+            if depth is not None and d >= depth:
+                continue
+            for j in step(i):
+                if j not in seen:
+                    seen.add(j); order.append(j)
+                    queue.append((j, d + 1))
+        return order
+
+    def ancestors(self, i: int, depth: Optional[int] = None) -> List[int]:
+        """Records upstream of `i` in breadth-first order, at most `depth` hops away."""
+        return self._walk([i], self.parents, depth)
+
+    def descendants(self, i: int, depth: Optional[int] = None) -> List[int]:
+        return self._walk([i], self.children, depth)
+
+    def lineage(self, digest: str, depth: Optional[int] = None) -> List[int]:
+        """Every record that produced `digest` and everything upstream of them."""
+        producers = self.index.lookup("outputs_digest", digest)
+        return producers + self._walk(producers, self.parents, depth)
+
+    def topological(self, indices: Optional[Iterable[int]] = None) -> Iterator[int]:
+        """Kahn's order over `indices` (default: all records), ties by index."""
+        nodes = set(range(self.size) if indices is None else indices)
+        indeg: Dict[int, int] = {i: sum(1 for p in self.parents(i) if p in nodes) for i in nodes}
+        ready = [i for i, d in indeg.items() if d == 0]
+        heapify(ready)
+        done = 0
+        while ready:
+            i = heappop(ready)
+            done += 1
+            yield i
+            for j in self.children(i):
+                if j in nodes:
+                    indeg[j] -= 1
+                    if indeg[j] == 0:
+                        heappush(ready, j)
+        if done != len(nodes):
+            raise ValueError("lineage graph has a cycle")
@@ -0,0 +1,404 @@
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+import hashlib, os
+
+def _h(a: bytes, b: bytes) -> bytes:
+    return hashlib.sha256(a + b).digest()
+
+def _right_edge(size: int, get: Callable[[int, int], bytes]) -> Dict[int, bytes]:
+    """Partial (right-edge) nodes of the tree over the first `size` leaves.
+
+    Only the last complete node of a level whose bit is set in `size` is ever
+    read through `get`, so the edge can also be rebuilt from peaks alone.
+    """
+    edge: Dict[int, bytes] = {}
+    carry: Optional[bytes] = None
+    k = 0
+    count = size
+    while count > 1:
+        if carry is not None or count % 2:
+            last = carry if carry is not None else get(k, count-1)
+            if count % 2:
+                carry = _h(last, last)
+            else:
+                carry = _h(get(k, count-2), last)
+            edge[k+1] = carry
+        count = (count + 1) // 2
+        k += 1
+    return edge
+
+def _peak_levels(size: int) -> List[int]:
+    return [k for k in reversed(range(size.bit_length())) if size >> k & 1]
+
+def _root_from_peaks(size: int, peaks: List[bytes]) -> bytes:
+    if size == 0:
+        return hashlib.sha256(b"").digest()
+    by_level = dict(zip(_peak_levels(size), peaks))
+    k = (size - 1).bit_length()
+    return _right_edge(size, lambda lvl, j: by_level[lvl]).get(k) or by_level[k]
+
+def _peak_nodes(size: int) -> List[Tuple[int, int]]:
+    """(level, index) of each peak of the first `size` leaves, left to right."""
+    return [(k, (size >> k) - 1) for k in _peak_levels(size)]
+
+def _tops(size: int, mmr: bool) -> List[Tuple[int, int]]:
+    # the nodes a root is computed from: the MMR peaks, or the single tree root
+    return _peak_nodes(size) if mmr else [((size - 1).bit_length(), 0)]
+
+def _bag(peaks: List[bytes]) -> bytes:
+    # Merkle Mountain Range root: peaks folded right to left
+    if not peaks:
+        return hashlib.sha256(b"").digest()
+    acc = peaks[-1]
+    for p in reversed(peaks[:-1]):
+        acc = _h(p, acc)
+    return acc
+
+class MerkleTree:
+    """Append-only Merkle tree with the same shape as `ledger.merkle_root`.
+
+    ``_levels[k]`` packs the 32-byte roots of every *complete* 2**k block of
+    leaves. Complete nodes never change once written, so an append touches at
+    most one node per level and a root only has to recompute the right edge.
+
+    A tree restored with `from_peaks` starts ``_base[k]`` nodes into each
+    level: it can append, commit and prove anything appended afterwards, and
+    `hydrate` fills in the older history when a proof needs it.
+    """
+
+    def __init__(self) -> None:
+        self._levels: List[bytearray] = [bytearray()]
+        self._base: List[int] = [0]
+
+    @classmethod
+    def from_peaks(cls, size: int, peaks: List[bytes]) -> "MerkleTree":
+        tree = cls()
+        levels = size.bit_length()
+        tree._levels = [bytearray() for _ in range(max(levels, 1))]
+        tree._base = [size >> k for k in range(max(levels, 1))]
+        for k, peak in zip(_peak_levels(size), peaks):
+            tree._base[k] -= 1
+            tree._levels[k] += peak
+        return tree
+
+    @property
+    def partial(self) -> bool:
+        return any(self._base)
+
+    def __len__(self) -> int:
+        return self._base[0] + len(self._levels[0]) // 32
+
+    def _count(self, k: int) -> int:
+        return self._base[k] + len(self._levels[k]) // 32 if k < len(self._levels) else 0
+
+    def _get(self, k: int, j: int) -> bytes:
+        local = j - self._base[k]
+        if local < 0:
+            raise LookupError(f"node {j} on level {k} predates the checkpoint; hydrate the tree first")
+        return bytes(self._levels[k][32*local:32*local+32])
+
+    def leaf(self, index: int) -> bytes:
+        return self._get(0, index)
+
+    def leaves(self, start: int, stop: int) -> bytes:
+        """Leaves [start, stop) packed as 32-byte chunks."""
+        base = self._base[0]
+        if start < base:
+            raise LookupError(f"leaf {start} predates the checkpoint; hydrate the tree first")
+        return bytes(self._levels[0][32*(start-base):32*(stop-base)])
+
+    def hydrate(self, prefix: bytes) -> None:
+        """Rebuild the levels pruned by `from_peaks` from the first leaves, packed."""
+        if len(prefix) != 32 * self._base[0]:
+            raise ValueError("hydrate needs exactly the leaves before the checkpoint")
+        full = MerkleTree()
+        local = self._levels[0]
+        full.extend(prefix[i:i+32] for i in range(0, len(prefix), 32))
+        full.extend(local[i:i+32] for i in range(0, len(local), 32))
+        if full.root() != self.root():
+            raise ValueError("leaves do not reproduce the checkpointed frontier")
+        self._levels, self._base = full._levels, full._base
+
+    def truncate(self, size: int) -> None:
+        """Forget every leaf from `size` on."""
+        if not 0 <= size <= len(self):
+            raise IndexError(size)
+        if size < self._base[0]:
+            raise LookupError("cannot truncate into the checkpoint; hydrate the tree first")
+        levels = max(size.bit_length(), 1)
+        del self._levels[levels:], self._base[levels:]
+        for k, level in enumerate(self._levels):
+            del level[32 * ((size >> k) - self._base[k]):]
+
+    def _add_level(self) -> None:
+        self._levels.append(bytearray())
+        self._base.append(0)
+
+    def append(self, leaf: bytes) -> int:
+        index = len(self)
+        self._levels[0] += leaf
+        k = 0
+        while self._count(k) % 2 == 0:
+            n = self._count(k)
+            node = _h(self._get(k, n-2), self._get(k, n-1))
+            if k + 1 == len(self._levels):
+                self._add_level()
+            self._levels[k+1] += node
+            k += 1
+        return index
+
+    def extend(self, leaves: Iterable[bytes]) -> None:
+        """Append many leaves, hashing each new level in one pass."""
+        self._levels[0] += b"".join(leaves)
+        sha = hashlib.sha256
+        k = 0
+        while True:
+            level, base = self._levels[k], self._base[k]  # base is always even
+            pairs = self._count(k) // 2
+            if k + 1 == len(self._levels):
+                if not pairs:
+                    return
+                self._add_level()
+            done = self._count(k + 1)
+            if done == pairs:
+                return
+            off = base // 2
+            self._levels[k+1] += b"".join(sha(level[64*(j-off):64*(j-off)+64]).digest()
+                                          for j in range(done, pairs))
+            k += 1
+
+    def _edge(self, size: int) -> Dict[int, bytes]:
+        return _right_edge(size, self._get)
+
+    def root(self, size: Optional[int] = None) -> bytes:
+        size = len(self) if size is None else size
+        if size == 0:
+            return hashlib.sha256(b"").digest()
+        edge = self._edge(size)
+        k = max(size - 1, 0).bit_length()
+        return edge.get(k) or self._get(k, 0)
+
+    def node(self, k: int, j: int, size: int, edge: Optional[Dict[int, bytes]] = None) -> bytes:
+        """Node `j` on level `k` of the tree over the first `size` leaves."""
+        if (j + 1) << k <= size:
+            return self._get(k, j)
+        return (self._edge(size) if edge is None else edge)[k]
+
+    def audit_path(self, index: int, size: Optional[int] = None) -> List[Tuple[bytes, bool]]:
+        """Sibling hashes from leaf to root; the flag is True for a left sibling."""
+        size = len(self) if size is None else size
+        if not 0 <= index < size:
+            raise IndexError(index)
+        edge = self._edge(size)
+        path = []
+        k, j, count = 0, index, size
+        while count > 1:
+            sib = j ^ 1
+            if sib >= count:
+                sib = j  # odd level: last node is paired with itself
+            path.append((self.node(k, sib, size, edge), sib < j))
+            j >>= 1
+            count = (count + 1) // 2
+            k += 1
+        return path
+
+    def peaks(self, size: int) -> List[bytes]:
+        """Roots of the perfect subtrees that make up the first `size` leaves."""
+        return [self._get(k, (size >> k) - 1) for k in _peak_levels(size)]
+
+    def _cover(self, k: int, j: int, first: int, second: int,
+               edge: Optional[Dict[int, bytes]], path: List[bytes]) -> None:
+        # hashes that, with the peaks of `first`, rebuild node (k, j) of `second`
+        if (j + 1) << k <= first:
+            return  # an old peak, supplied by the verifier's side
+        if j << k >= first:
+            path.append(self.node(k, j, second, edge))
+            return
+        self._cover(k-1, 2*j, first, second, edge, path)
+        if 2*j + 1 < -(-second >> (k-1)):
+            self._cover(k-1, 2*j + 1, first, second, edge, path)
+
+    def consistency_proof(self, first: int, second: int) -> Tuple[List[bytes], List[bytes]]:
+        """Peaks of the `first`-leaf tree plus the hashes that lift them to `second`."""
+        if not 0 <= first <= second <= len(self):
+            raise IndexError((first, second))
+        path: List[bytes] = []
+        if second:
+            self._cover((second - 1).bit_length(), 0, first, second, self._edge(second), path)
+        return self.peaks(first), path
+
+    def multiproof(self, indices: List[int], size: Optional[int] = None, mmr: bool = False) -> List[bytes]:
+        """Siblings proving every leaf in `indices` at once, each hash sent once.
+
+        Walks the tree top-down and emits only the roots of subtrees that hold
+        no requested leaf, so clustered indices share their upper levels.
+        `indices` must be sorted and unique; with `mmr` each peak is covered.
+        """
+        size = len(self) if size is None else size
+        if not indices or indices[0] < 0 or indices[-1] >= size:
+            raise IndexError(indices[-1] if indices else None)
+        edge = None if mmr else self._edge(size)
+        path: List[bytes] = []
+
+        def cover(k: int, j: int, a: int, b: int) -> None:
+            if a == b:
+                path.append(self.node(k, j, size, edge))
+            elif k:
+                mid = bisect_left(indices, (2*j + 1) << (k-1), a, b)
+                cover(k-1, 2*j, a, mid)
+                if 2*j + 1 < -(-size >> (k-1)):
+                    cover(k-1, 2*j + 1, mid, b)
+
+        for k, j in _tops(size, mmr):
+            cover(k, j, bisect_left(indices, j << k), bisect_left(indices, (j + 1) << k))
+        return path
+
+    # Merkle Mountain Range view of the same levels: the root bags the peaks
+    # instead of padding the right edge, so a leaf's path to its peak is made
+    # of complete nodes only and never changes once the peak exists.
+
+    def mmr_root(self, size: Optional[int] = None) -> bytes:
+        return _bag(self.peaks(len(self) if size is None else size))
+
+    def mmr_path(self, index: int, size: Optional[int] = None) -> Tuple[List[Tuple[bytes, bool]], int]:
+        """Path from leaf `index` to its peak, and that peak's position."""
+        size = len(self) if size is None else size
+        if not 0 <= index < size:
+            raise IndexError(index)
+        for pos, (k, j) in enumerate(_peak_nodes(size)):
+            if index >> k == j:
+                path = []
+                for lvl in range(k):
+                    sib = index >> lvl ^ 1
+                    path.append((self._get(lvl, sib), sib & 1 == 0))
+                return path, pos
+        raise AssertionError("unreachable")
+
+    def mmr_consistency_proof(self, first: int, second: int) -> Tuple[List[bytes], List[bytes]]:
+        """Like `consistency_proof`, lifting the old peaks to each new peak."""
+        if not 0 <= first <= second <= len(self):
+            raise IndexError((first, second))
+        path: List[bytes] = []
+        for k, j in _peak_nodes(second):
+            self._cover(k, j, first, second, None, path)
+        return self.peaks(first), path
+
+def verify_consistency(old_root: str, new_root: str, proof: Dict[str, Any]) -> bool:
+    """Check a consistency proof; ``proof["mode"] == "mmr"`` selects peak bagging."""
+    mmr = proof.get("mode") == "mmr"
+    first, second = proof["first_size"], proof["second_size"]
+    if not 0 <= first <= second:
+        return False
+    peaks = [bytes.fromhex(p) for p in proof["peaks"]]
+    if len(peaks) != len(_peak_levels(first)):
+        return False
+    if (_bag(peaks) if mmr else _root_from_peaks(first, peaks)).hex() != old_root:
+        return False
+    if second == 0:
+        return new_root == old_root
+    known: Iterator[bytes] = iter(peaks)
+    extra: Iterator[bytes] = (bytes.fromhex(p) for p in proof["path"])
+
+    def rebuild(k: int, j: int) -> bytes:
+        if (j + 1) << k <= first:
+            return next(known)
+        if j << k >= first:
+            return next(extra)
+        left = rebuild(k-1, 2*j)
+        right = rebuild(k-1, 2*j + 1) if 2*j + 1 < -(-second >> (k-1)) else left
+        return _h(left, right)
+
+    try:
+        if mmr:
+            root = _bag([rebuild(k, j) for k, j in _peak_nodes(second)])
+        else:
+            root = rebuild((second - 1).bit_length(), 0)
+    except StopIteration:
+        return False
+    return next(extra, None) is None and root.hex() == new_root
+
+def verify_inclusion(leaf: str, proof: Dict[str, Any], root: str) -> bool:
+    """Check an audit path; an MMR proof ends at ``proof["peaks"][proof["peak"]]``."""
+    h = bytes.fromhex(leaf)
+    for sib, side in proof["path"]:
+        h = _h(bytes.fromhex(sib), h) if side == "L" else _h(h, bytes.fromhex(sib))
+    if proof.get("mode") == "mmr":
+        peaks = [bytes.fromhex(p) for p in proof["peaks"]]
+        pos = proof["peak"]
+        return 0 <= pos < len(peaks) and peaks[pos] == h and _bag(peaks).hex() == root
+    return h.hex() == root
+
+def verify_multiproof(leaves: List[str], proof: Dict[str, Any], root: str) -> bool:
+    """Check a `multiproof` for the leaves of ``proof["indices"]``, in one pass."""
+    indices, size = proof["indices"], proof["size"]
+    mmr = proof.get("mode") == "mmr"
+    if (not indices or len(leaves) != len(indices) or indices[0] < 0 or indices[-1] >= size
+            or any(a >= b for a, b in zip(indices, indices[1:]))):
+        return False
+    extra: Iterator[bytes] = (bytes.fromhex(p) for p in proof["path"])
+
+    def rebuild(k: int, j: int, a: int, b: int) -> bytes:
+        if a == b:
+            return next(extra)
+        if not k:
+            return bytes.fromhex(leaves[a])
+        mid = bisect_left(indices, (2*j + 1) << (k-1), a, b)
+        left = rebuild(k-1, 2*j, a, mid)
+        right = rebuild(k-1, 2*j + 1, mid, b) if 2*j + 1 < -(-size >> (k-1)) else left
+        return _h(left, right)
+
+    try:
+        tops = [rebuild(k, j, bisect_left(indices, j << k), bisect_left(indices, (j + 1) << k))
+                for k, j in _tops(size, mmr)]
+    except StopIteration:
+        return False
+    got = _bag(tops) if mmr else tops[0]
+    return next(extra, None) is None and got.hex() == root
+
+def _subtree_root(packed: bytes, height: int) -> bytes:
+    """Root of the 2**height-leaf block whose first leaves are packed in `packed`.
+
+    A short block is padded the way `merkle_root` pads the right edge: an odd
+    last node is hashed with itself on every level up to `height`.
+    """
+    sha = hashlib.sha256
+    level = packed
+    for _ in range(height):
+        if len(level) % 64:
+            level += level[-32:]
+        level = b"".join(sha(level[i:i+64]).digest() for i in range(0, len(level), 64))
+    return level
+
+def merkle_root_parallel(hashes: Any, workers: Optional[int] = None,
+                         executor: Optional[Executor] = None, min_chunk: int = 1 << 14) -> str:
+    """Byte-identical `merkle_root` that hashes power-of-two subtrees in a pool.
+
+    `hashes` is a list of hex digests or the leaves packed as 32-byte chunks.
+    Without an `executor` a process pool of `workers` processes is used; a
+    thread pool only helps where hashing releases the GIL (large buffers).
+    """
+    packed = hashes if isinstance(hashes, (bytes, bytearray)) else b"".join(bytes.fromhex(h) for h in hashes)
+    n = len(packed) // 32
+    workers = workers or os.cpu_count() or 1
+    height = max(min_chunk - 1, 1).bit_length()
+    while (n >> height) > 4 * workers:
+        height += 1
+    chunk = 32 << height
+    if n <= 1 << height:
+        tree = MerkleTree()
+        tree.extend(packed[i:i+32] for i in range(0, len(packed), 32))
+        return tree.root().hex()
+    parts = [bytes(packed[i:i+chunk]) for i in range(0, len(packed), chunk)]
+    pool = executor or ProcessPoolExecutor(workers)
+    try:
+        level = list(pool.map(_subtree_root, parts, [height] * len(parts)))
+    finally:
+        if executor is None:
+            pool.shutdown()
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [_h(level[i], level[i+1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
@@ -1,20 +1,25 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .ledger import LedgerRecord
 import json
 
-def prov_jsonld(records: List[LedgerRecord]) -> Dict[str, Any]:
+def prov_jsonld(records: List[LedgerRecord], lineage: Any = None,
+                indices: Optional[List[int]] = None) -> Dict[str, Any]:
+    # `indices` are the ledger positions of `records` (default 0..n-1); with a
+    # LineageGraph, edges between the given records become prov:wasInformedBy.
     ctx = {
         "@context": "https://www.w3.org/ns/prov.jsonld",
         "activity": "prov:Activity",
         "entity": "prov:Entity",
         "used": "prov:used",
         "wasGeneratedBy": "prov:wasGeneratedBy",
+        "wasInformedBy": "prov:wasInformedBy",
     }
     ents = []
     acts = []
     edges = []
-    for i, r in enumerate(records):
+    indices = list(range(len(records))) if indices is None else list(indices)
+    for i, r in zip(indices, records):
         ent_in = {"@id": f"entity:input:{i}", "@type": "entity", "digest": r.inputs_digest}
         ent_out= {"@id": f"entity:output:{i}", "@type": "entity", "digest": r.outputs_digest}
         act    = {"@id": f"activity:{i}", "@type": "activity", "op": r.op_id, "kind": r.kind, "gauge": r.gauge}
@@ -23,4 +28,10 @@ def prov_jsonld(records: List[LedgerRecord]) -> Dict[str, Any]:
             {"@id": f"used:{i}", "used": ent_in["@id"], "activity": act["@id"]},
             {"@id": f"wgb:{i}", "wasGeneratedBy": ent_out["@id"], "activity": act["@id"]},
         ]
+    if lineage is not None:
+        present = set(indices)
+        for j in indices:
+            for i in lineage.parents(j):
+                if i in present:
+                    edges.append({"@id": f"wib:{j}:{i}", "wasInformedBy": f"activity:{i}", "activity": f"activity:{j}"})
     return {"@context": ctx["@context"], "entity": ents, "activity": acts, "relations": edges}
@@ -0,0 +1,208 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+import asyncio, json
+from .ledger import LedgerRecord, LedgerStore, leaf_digest
+
+# Wire protocol: one JSON object per line in each direction. A request is
+# {"id": ..., "op": ..., ...}; its reply echoes "id" and carries either
+# "result" or "error". Replies on a connection come back in request order.
+#
+#   append  {"record": {...}, "commit": false} -> {"index": i[, "root": r]}
+#   commit  {}                                 -> {"size": n, "root": r}
+#   prove   {"index": i}                       -> proof_of_inclusion(i)
+#   get     {"index": i}                       -> {"record": {...}}
+#   lookup  {"digest": d, "field": "outputs_digest"} -> {"records": [{"index", "record"}]}
+
+def _jsonable(rec: Any) -> Dict[str, Any]:
+    return json.loads(json.dumps(asdict(rec), default=str))
+
+class LedgerServer:
+    """Serve one `LedgerStore` to many clients over a Unix or TCP socket.
+
+    Clients may pipeline requests. Appends and commits from every connection
+    go through one queue; a single writer drains it and hands each batch to
+    ``append_many`` with at most one ``commit_root``, so concurrent appends
+    cost one write and one fsync per batch rather than per record. A record
+    that fails is rolled back and only its own request gets the error. Reads
+    run on worker threads against the latest committed snapshot, after the
+    connection's own earlier writes have landed.
+    """
+
+    def __init__(self, store: LedgerStore, max_batch: int = 4096) -> None:
+        self.store = store
+        self.max_batch = max_batch
+        self._queue: List[Any] = []  # (record or None, commit, future)
+        self._wake: Optional[asyncio.Event] = None
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="ledger-writer")
+        self._flusher: Optional[asyncio.Task] = None
+        self._conns: Dict[asyncio.Task, asyncio.StreamReader] = {}
+
+    async def start(self, path: Optional[str] = None, host: str = "127.0.0.1",
+                    port: int = 0) -> asyncio.AbstractServer:
+        """Listen on the Unix socket `path`, or on `host`:`port` if it is None."""
+        self._wake = asyncio.Event()
+        self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve, path, limit=1 << 24)
+        return await asyncio.start_server(self._serve, host, port, limit=1 << 24)
+
+    async def stop(self) -> None:
+        """Close every connection once its pending requests are answered."""
+        for reader in self._conns.values():
+            reader.feed_eof()
+        await asyncio.gather(*self._conns, return_exceptions=True)
+        if self._flusher is not None:
+            self._flusher.cancel()
+        self._writer.shutdown()
+
+    def _submit(self, rec: Optional[LedgerRecord], commit: bool) -> "asyncio.Future[Any]":
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.append((rec, commit, fut))
+        self._wake.set()
+        return fut
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._queue:
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                recs = [r for r, _, _ in batch if r is not None]
+                commit = any(c for _, c, _ in batch)
+                try:
+                    indices, size, root = await loop.run_in_executor(self._writer, self._write, recs, commit)
+                except Exception as e:  # the rollback itself failed
+                    for _, _, fut in batch:
+                        fut.set_exception(e)
+                    continue
+                results = iter(indices)
+                for rec, c, fut in batch:
+                    if rec is None:
+                        if isinstance(root, Exception):
+                            fut.set_exception(root)
+                        else:
+                            fut.set_result({"size": size, "root": root})
+                        continue
+                    i = next(results)
+                    if isinstance(i, Exception):
+                        fut.set_exception(i)
+                    elif c and not isinstance(root, Exception):
+                        fut.set_result({"index": i, "root": root})
+                    else:
+                        fut.set_result({"index": i})
+
+    def _write(self, recs: List[LedgerRecord], commit: bool) -> Any:
+        # append_many, falling back to one record at a time if it fails; a
+        # failed append is truncated away, so only unwritten records get errors
+        store = self.store
+        start = len(store)
+        try:
+            store.append_many(recs)
+            indices: List[Any] = list(range(start, start + len(recs)))
+        except Exception:
+            store.truncate(start)
+            indices = []
+            for rec in recs:
+                n = len(store)
+                try:
+                    indices.append(store.append(rec))
+                except Exception as e:
+                    store.truncate(n)
+                    indices.append(e)
+        root: Any = None
+        if commit:
+            try:
+                root = store.commit_root()
+            except Exception as e:
+                root = e
+        return indices, len(store), root
+
+    def _read(self, op: str, req: Dict[str, Any]) -> Any:
+        store = self.store
+        if op == "prove":
+            return store.proof_of_inclusion(int(req["index"]))
+        if op == "get":
+            index = int(req["index"])
+            if not 0 <= index < len(store):
+                raise IndexError(index)
+            return {"record": _jsonable(store.get(index))}
+        if op == "lookup":
+            hits = store.find(**{req.get("field", "outputs_digest"): req["digest"]})
+            return {"records": [{"index": i, "record": _jsonable(store.get(i))} for i in hits]}
+        raise ValueError(f"unknown op {op!r}")
+
+    async def _handle(self, req: Dict[str, Any], written: "asyncio.Future[Any]") -> Any:
+        op = req.get("op")
+        if op == "append":
+            rec = LedgerRecord(**req["record"])
+            leaf_digest(rec, self.store.leaf_version)  # reject what cannot be hashed before it is queued
+            return await self._submit(rec, bool(req.get("commit")))
+        if op == "commit":
+            return await self._submit(None, True)
+        if written is not None:
+            await asyncio.wait([written])
+        return await asyncio.get_running_loop().run_in_executor(None, self._read, op, req)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        replies: "asyncio.Queue[Any]" = asyncio.Queue()
+        sender = asyncio.get_running_loop().create_task(self._send(replies, writer))
+        written = None  # this connection's most recent write
+        self._conns[asyncio.current_task()] = reader
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    req = json.loads(line)
+                    if not isinstance(req, dict):
+                        raise ValueError("request must be a JSON object")
+                    task = asyncio.ensure_future(self._handle(req, written))
+                except ValueError as e:
+                    req, task = {}, asyncio.get_running_loop().create_future()
+                    task.set_exception(e)
+                if req.get("op") in ("append", "commit"):
+                    written = task
+                await replies.put((req.get("id"), task))
+        finally:
+            await replies.put(None)
+            await sender
+            del self._conns[asyncio.current_task()]
+
+    async def _send(self, replies: "asyncio.Queue[Any]", writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                item = await replies.get()
+                if item is None:
+                    break
+                rid, task = item
+                try:
+                    reply = {"id": rid, "result": await task}
+                except Exception as e:
+                    reply = {"id": rid, "error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(reply, default=str).encode() + b"\n")
+                if replies.empty():
+                    await writer.drain()
+        finally:
+            writer.close()
+
+def serve(store: LedgerStore, path: Optional[str] = None, host: str = "127.0.0.1",
+          port: int = 0, max_batch: int = 4096) -> None:
+    """Run a `LedgerServer` until interrupted, then close the store."""
+    async def main() -> None:
+        server = LedgerServer(store, max_batch)
+        listener = await server.start(path, host, port)
+        try:
+            async with listener:
+                await listener.serve_forever()
+        finally:
+            await server.stop()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import hashlib, json, multiprocessing, os
+from .ledger import LedgerStore, Snapshot, merkle_root
+from .merkle import MerkleTree, verify_inclusion
+
+def shard_of(rec: Any, shards: int, key: str = "op_id") -> int:
+    """Shard for `rec`: a hash of its op_id, or the leading bytes of a digest field."""
+    value = getattr(rec, key)
+    if key.endswith("_digest"):
+        try:
+            return int(value[:16], 16) % shards
+        except ValueError:
+            pass
+    return int.from_bytes(hashlib.sha256(value.encode()).digest()[:8], "big") % shards
+
+def verify_sharded_inclusion(leaf: str, proof: Dict[str, Any], root: str) -> bool:
+    """Check a `ShardedLedger` proof: leaf -> shard root -> global root."""
+    return (verify_inclusion(leaf, proof, proof["shard_root"])
+            and verify_inclusion(proof["shard_root"], {"path": proof["top_path"]}, root))
+
+def _lock(path: str) -> Any:
+    # exclusive lock on `path`/LOCK, held until the returned file is closed
+    os.makedirs(path, exist_ok=True)
+    f = open(os.path.join(path, "LOCK"), "a+")
+    try:
+        try:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:  # Windows
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        raise BlockingIOError(f"{path} is in use by another process") from None
+    return f
+
+def _serve_shard(path: str, kw: Dict[str, Any], conn: Any) -> None:
+    # worker process: owns the shard directory and answers calls until "close"
+    try:
+        lock = _lock(path)
+        store = LedgerStore.open(path, **kw)
+    except Exception as e:
+        conn.send(("err", e))
+        return
+    conn.send(("ok", None))
+    try:
+        while True:
+            try:
+                op, args = conn.recv()
+            except EOFError:  # the coordinator died
+                return
+            if op == "close":
+                break
+            try:
+                conn.send(("ok", getattr(store, op)(*args)))
+            except Exception as e:
+                conn.send(("err", e))
+    finally:
+        store.close()
+        lock.close()
+    conn.send(("ok", None))
+
+class ShardProcess:
+    """A segment-file `LedgerStore` run by a worker process that owns its directory.
+
+    The worker holds the directory's LOCK file for as long as it runs, so no
+    other process can open the shard. Calls are forwarded over a pipe, and
+    `submit` sends one without waiting, so a coordinator can keep every
+    worker busy at once. Records are pickled across the pipe, which only
+    pays off with a core per shard to spare. Workers are spawned, so the
+    program's main module must be import-safe (``if __name__ == "__main__"``).
+    """
+
+    def __init__(self, path: str, **kw: Any) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child = ctx.Pipe()
+        self._proc = ctx.Process(target=_serve_shard, args=(path, kw, child), daemon=True)
+        self._proc.start()
+        child.close()
+        self._result()  # the directory is locked and open, or this raises
+
+    def _result(self) -> Any:
+        status, value = self._conn.recv()
+        if status == "err":
+            raise value
+        return value
+
+    def submit(self, op: str, *args: Any) -> Callable[[], Any]:
+        """Start ``store.<op>(*args)`` in the worker; call the result to wait for it."""
+        self._conn.send((op, args))
+        return self._result
+
+    def append(self, rec: Any) -> int:
+        return self.submit("append", rec)()
+
+    def append_many(self, recs: Iterable[Any]) -> Tuple[int, int, Optional[str]]:
+        return self.submit("append_many", list(recs))()
+
+    def commit_root(self) -> str:
+        return self.submit("commit_root")()
+
+    def snapshot(self) -> Optional[Snapshot]:
+        return self.submit("snapshot")()
+
+    def proof_of_inclusion(self, index: int, snapshot: Optional[Snapshot] = None) -> Dict[str, Any]:
+        return self.submit("proof_of_inclusion", index, snapshot)()
+
+    def __len__(self) -> int:
+        return self.submit("__len__")()
+
+    def close(self) -> None:
+        if self._proc.is_alive():
+            self.submit("close")()
+        self._proc.join()
+        self._conn.close()
+
+class ShardedLedger:
+    """N independent `LedgerStore` shards under one root-of-roots.
+
+    Records are routed by `shard_of`; each shard keeps its own Merkle frontier
+    and sequencer. `commit_root` commits every shard and returns
+    ``merkle_root(shard roots)``, and an inclusion proof is the shard's audit
+    path followed by the shard root's path in the top-level tree.
+
+    `open` runs the shards in this process, where threads can overlap
+    their file writes and fsyncs but not their hashing, or with
+    ``processes=True`` one `ShardProcess` per shard, so every shard hashes
+    and writes on its own core. Either way each shard directory is locked
+    against other processes, as is the directory of the root-of-roots, which
+    only sees records appended through this object.
+    """
+
+    def __init__(self, shards: List[LedgerStore], key: str = "op_id", path: Optional[str] = None) -> None:
+        assert shards, "need at least one shard"
+        self.shards = shards
+        self.key = key
+        self.path = path
+        self._commits: List[Dict[str, Any]] = []  # {"sizes", "shard_roots", "root"}
+        self._locks: List[Any] = []
+        if path is not None and os.path.exists(os.path.join(path, "roots")):
+            with open(os.path.join(path, "roots")) as f:
+                for line in f:
+                    if line.endswith("\n"):  # a torn last line never committed
+                        self._commits.append(json.loads(line))
+
+    @staticmethod
+    def shard_path(path: str, k: int) -> str:
+        return os.path.join(path, f"shard-{k:03d}")
+
+    @classmethod
+    def open(cls, path: str, shards: int, key: str = "op_id", processes: bool = False,
+             **kw: Any) -> "ShardedLedger":
+        """Open (or create) a directory of `shards` segment-file shards.
+
+        The shard count and routing key are fixed at creation; reopening with
+        different ones raises ValueError, since records would be misrouted.
+        With `processes` every shard is served by its own `ShardProcess`;
+        the other options go to `LedgerStore.open` either way.
+        """
+        locks, opened = [_lock(path)], []
+        try:
+            cls._layout(path, shards, key)
+            for k in range(shards):
+                if processes:
+                    opened.append(ShardProcess(cls.shard_path(path, k), **kw))
+                else:
+                    locks.append(_lock(cls.shard_path(path, k)))
+                    opened.append(LedgerStore.open(cls.shard_path(path, k), **kw))
+        except BaseException:
+            for shard in opened:
+                shard.close()
+            for f in locks:
+                f.close()
+            raise
+        ledger = cls(opened, key, path)
+        ledger._locks = locks
+        return ledger
+
+    @staticmethod
+    def _layout(path: str, shards: int, key: str) -> None:
+        layout = os.path.join(path, "shards.json")
+        if os.path.exists(layout):
+            with open(layout) as f:
+                saved = json.load(f)
+            if saved != {"shards": shards, "key": key}:
+                raise ValueError(f"{path} was created with {saved}")
+        else:
+            with open(layout, "w") as f:
+                json.dump({"shards": shards, "key": key}, f)
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+        for f in self._locks:
+            f.close()
+        self._locks = []
+
+    def _each(self, op: str, args: Optional[List[Tuple[Any, ...]]] = None) -> List[Any]:
+        # ``shard.<op>(*args)`` on every shard; worker processes run theirs at once
+        args = args or [()] * len(self.shards)
+        pending = [s.submit(op, *a) if isinstance(s, ShardProcess) else None
+                   for s, a in zip(self.shards, args)]
+        return [wait() if wait else getattr(s, op)(*a) for wait, s, a in zip(pending, self.shards, args)]
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.shards)
+
+    def route(self, rec: Any) -> int:
+        return shard_of(rec, len(self.shards), self.key)
+
+    def append(self, rec: Any) -> Tuple[int, int]:
+        """Append `rec` to its shard; returns ``(shard, index within shard)``."""
+        k = self.route(rec)
+        return k, self.shards[k].append(rec)
+
+    def append_many(self, recs: Iterable[Any], executor: Any = None) -> List[Tuple[int, int]]:
+        """Append records grouped by shard, one ``append_many`` per shard.
+
+        `ShardProcess` shards are always written concurrently; with a thread
+        `executor` in-process shards are too, as their locks, files and
+        fsyncs are independent. Returns ``(shard, index)`` for each record in
+        input order.
+        """
+        groups: List[List[Any]] = [[] for _ in self.shards]
+        where = []
+        for rec in recs:
+            k = self.route(rec)
+            where.append((k, len(groups[k])))
+            groups[k].append(rec)
+        if executor is not None:
+            done = executor.map(lambda k: self.shards[k].append_many(groups[k]), range(len(groups)))
+        else:
+            done = self._each("append_many", [(g,) for g in groups])
+        starts = [r[0] for r in done]
+        return [(k, starts[k] + j) for k, j in where]
+
+    def commit_root(self) -> str:
+        # built from the shards' committed snapshots, whichever process holds them
+        self._each("commit_root")
+        snaps = self._each("snapshot")
+        roots = [s.root for s in snaps]
+        commit = {"sizes": [s.size for s in snaps], "shard_roots": roots, "root": merkle_root(roots)}
+        self._commits.append(commit)
+        if self.path is not None:
+            with open(os.path.join(self.path, "roots"), "a") as f:
+                f.write(json.dumps(commit) + "\n")
+                f.flush(); os.fsync(f.fileno())
+        return commit["root"]
+
+    def roots(self) -> List[str]:
+        return [c["root"] for c in self._commits]
+
+    def proof_of_inclusion(self, shard: int, index: int) -> Dict[str, Any]:
+        """Prove record `index` of `shard` under the latest global root."""
+        assert self._commits, "no committed root"
+        commit = self._commits[-1]
+        size, shard_root = commit["sizes"][shard], commit["shard_roots"][shard]
+        proof = self.shards[shard].proof_of_inclusion(index, Snapshot(size, shard_root, 0))
+        top = MerkleTree()
+        top.extend(bytes.fromhex(r) for r in commit["shard_roots"])
+        proof.update(
+            shard=shard, shard_root=shard_root, root=commit["root"],
+            top_path=[[sib.hex(), "L" if left else "R"] for sib, left in top.audit_path(shard, len(top))],
+        )
+        return proof
@@ -0,0 +1,208 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import hashlib
+from .encoding import raw_digest
+from .index import View, dump_state, load_state
+
+DEPTH = 256
+_EMPTY = [bytes(32)]
+for _ in range(DEPTH):
+    _EMPTY.append(hashlib.sha256(b"\x01" + _EMPTY[-1] + _EMPTY[-1]).digest())
+
+def smt_key(digest: str) -> bytes:
+    """256-bit key of a digest: its raw bytes (see `raw_digest`), or its sha256 otherwise."""
+    return raw_digest(digest) or hashlib.sha256(digest.encode()).digest()
+
+def _leaf(key: int, value: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + key.to_bytes(32, "big") + value).digest()
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+class SparseMerkleTree(View):
+    """Sparse Merkle tree over 2**256 keys: ``outputs_digest -> record indices``.
+
+    A subtree holding one key hashes as the leaf ``H(0x00|key|value)`` and an
+    empty one as a precomputed default, so only subtrees with two or more keys
+    are hashed as ``H(0x01|left|right)``; the node where such a subtree
+    branches is cached, keyed by the first key of its right half. Appends are
+    queued and applied as one batch by `root` or `prove`, which rehashes only
+    the paths of the changed keys. A proof holds one sibling per level above
+    the key's subtree (at most 256) and shows membership or non-membership.
+
+    A key's value is its record indices packed as big-endian u64s, so a
+    membership proof also pins down exactly which records produced it.
+    """
+    name = "smt"
+    format = 2  # digests keyed by raw_digest
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._keys: List[int] = []  # sorted; keys are kept as 256-bit ints
+        self._values: Dict[int, bytes] = {}
+        self._branches: Dict[int, bytes] = {}
+        self._pending: List[Tuple[int, int]] = []
+        self._root = _EMPTY[DEPTH]
+
+    def dumps(self) -> bytes:
+        # 256-bit int keys would bloat JSON; store them as packed 32-byte keys
+        self._flush()
+        keys, branches = self._keys, list(self._branches)
+        return dump_state({
+            "format": self.format, "size": self.size, "root": self._root,
+            "keys": b"".join(k.to_bytes(32, "big") for k in keys),
+            "lengths": array("I", (len(self._values[k]) for k in keys)),
+            "values": b"".join(self._values[k] for k in keys),
+            "splits": b"".join(k.to_bytes(32, "big") for k in branches),
+            "branches": b"".join(self._branches[k] for k in branches),
+        })
+
+    def loads(self, data: bytes) -> None:
+        state = load_state(data)
+        if state.get("format", 1) != self.format:
+            raise ValueError("view state of another format")
+        self.__init__()
+        self.size, self._root = state["size"], state["root"]
+        raw = state["keys"]
+        self._keys = [int.from_bytes(raw[j:j+32], "big") for j in range(0, len(raw), 32)]
+        values, pos = state["values"], 0
+        for key, n in zip(self._keys, state["lengths"]):
+            self._values[key] = values[pos:pos+n]; pos += n
+        splits, branches = state["splits"], state["branches"]
+        for j in range(0, len(splits), 32):
+            self._branches[int.from_bytes(splits[j:j+32], "big")] = branches[j:j+32]
+
+    def add(self, i: int, rec: Any) -> None:
+        self._pending.append((int.from_bytes(smt_key(rec.outputs_digest), "big"), i))
+        self.size = i + 1
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        values = self._values
+        touched, fresh = set(), []
+        for key, i in self._pending:
+            old = values.get(key)
+            if old is None:
+                fresh.append(key)
+                old = b""
+            values[key] = old + i.to_bytes(8, "big")
+            touched.add(key)
+        self._pending = []
+        if fresh:
+            self._keys += fresh
+            self._keys.sort()  # two sorted runs merged in C
+        self._changed = self._keys if len(touched) == len(values) else sorted(touched)
+        try:
+            self._root = self._subtree(DEPTH, 0, len(self._keys), 0, len(self._changed))
+        finally:
+            del self._changed
+
+    def _leaf(self, lo: int) -> bytes:
+        key = self._keys[lo]
+        return _leaf(key, self._values[key])
+
+    def _subtree(self, height: int, lo: int, hi: int, clo: int = 0, chi: int = 0) -> bytes:
+        # hash at `height` of the subtree holding _keys[lo:hi], rehashing the
+        # branches above _changed[clo:chi]
+        if hi - lo < 2:
+            return self._leaf(lo) if hi > lo else _EMPTY[height]
+        keys = self._keys
+        first = keys[lo]
+        top = (first ^ keys[hi-1]).bit_length()
+        split = (first >> (top - 1) | 1) << (top - 1)
+        if chi - clo == hi - lo:
+            h = self._build(lo, hi)
+        elif clo < chi:
+            mid = bisect_left(keys, split, lo, hi)
+            cut = bisect_left(self._changed, split, clo, chi)
+            left = self._subtree(top - 1, lo, mid, clo, cut) if mid - lo > 1 else self._leaf(lo)
+            right = self._subtree(top - 1, mid, hi, cut, chi) if hi - mid > 1 else self._leaf(mid)
+            h = self._branches[split] = hashlib.sha256(b"\x01" + left + right).digest()
+        else:
+            h = self._branches[split]
+        for level in range(top, height):  # no other keys between the branch and `height`
+            h = _node(_EMPTY[level], h) if first >> level & 1 else _node(h, _EMPTY[level])
+        return h
+
+    def _build(self, lo: int, hi: int) -> bytes:
+        # branch hash of _keys[lo:hi] (two or more keys) built bottom-up in one
+        # pass: adjacent keys meet at the height of their highest differing bit
+        keys, values, branches = self._keys, self._values, self._branches
+        sha = hashlib.sha256
+        stack: List[Any] = []  # (hash, branch height or 0 for one key, first key, where it meets the next)
+        for i in range(lo, hi):
+            key = keys[i]
+            h, top, first = sha(b"\x00" + key.to_bytes(32, "big") + values[key]).digest(), 0, key
+            meet = (key ^ keys[i+1]).bit_length() if i + 1 < hi else DEPTH + 1
+            while stack and stack[-1][3] < meet:
+                lh, ltop, lfirst, at = stack.pop()
+                if ltop:  # a lone key needs no lifting
+                    for level in range(ltop, at - 1):
+                        lh = _node(_EMPTY[level], lh) if lfirst >> level & 1 else _node(lh, _EMPTY[level])
+                if top:
+                    for level in range(top, at - 1):
+                        h = _node(_EMPTY[level], h) if first >> level & 1 else _node(h, _EMPTY[level])
+                h = sha(b"\x01" + lh + h).digest()
+                branches[(lfirst >> (at - 1) | 1) << (at - 1)] = h
+                top, first = at, lfirst
+            stack.append((h, top, first, meet))
+        return stack[0][0]
+
+    def update(self, items: Iterable[Tuple[str, int]]) -> None:
+        """Record ``(digest, index)`` pairs directly, as one batch."""
+        self._pending.extend((int.from_bytes(smt_key(d), "big"), i) for d, i in items)
+        self._flush()
+
+    def root(self) -> str:
+        self._flush()
+        return self._root.hex()
+
+    def prove(self, digest: str) -> Dict[str, Any]:
+        """Membership or non-membership proof for `digest` under `root`."""
+        self._flush()
+        key = int.from_bytes(smt_key(digest), "big")
+        siblings = []
+        height, lo, hi = DEPTH, 0, len(self._keys)
+        while hi - lo >= 2:
+            height -= 1
+            mid = bisect_left(self._keys, (key >> height | 1) << height, lo, hi)
+            if key >> height & 1:
+                siblings.append(self._subtree(height, lo, mid).hex())
+                lo = mid
+            else:
+                siblings.append(self._subtree(height, mid, hi).hex())
+                hi = mid
+        proof: Dict[str, Any] = {"digest": digest, "siblings": siblings, "leaf": None}
+        if hi - lo == 1:
+            found = self._keys[lo]
+            proof["leaf"] = [found.to_bytes(32, "big").hex(), self._values[found].hex()]
+        return proof
+
+def verify_smt_proof(proof: Dict[str, Any], root: str) -> Optional[List[int]]:
+    """The record indices a proof shows for its digest ([] if it proves absence).
+
+    Returns None if the proof does not lead to `root`.
+    """
+    key = int.from_bytes(smt_key(proof["digest"]), "big")
+    siblings = [bytes.fromhex(s) for s in proof["siblings"]]
+    height = DEPTH - len(siblings)
+    if height < 0:
+        return None
+    leaf = proof["leaf"]
+    if leaf is None:
+        h, indices = _EMPTY[height], []
+    else:
+        other, value = int(leaf[0], 16), bytes.fromhex(leaf[1])
+        if other >> height != key >> height:
+            return None  # the leaf must sit in the subtree the key's path leads to
+        h = _leaf(other, value)
+        if other == key:
+            indices = [int.from_bytes(value[j:j+8], "big") for j in range(0, len(value), 8)]
+        else:
+            indices = []
+    for k, sib in zip(range(height, DEPTH), reversed(siblings)):
+        h = _node(sib, h) if key >> k & 1 else _node(h, sib)
+    return indices if h.hex() == root else None
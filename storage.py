@@ -0,0 +1,347 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json, mmap, os, struct, threading, time, zlib
+from .ledger import LedgerRecord
+from .encoding import encode_record, decode_record
+
+# Each record is framed as <payload length, crc32> + payload; the per-segment
+# .idx file holds one little-endian uint64 data offset per record. Payloads are
+# encoding.encode_record bytes; segments written before it hold JSON objects.
+_FRAME = struct.Struct("<II")
+_OFF = struct.Struct("<Q")
+
+def _decode(payload: bytes) -> LedgerRecord:
+    if payload[:1] == b"{":
+        return LedgerRecord(**json.loads(payload))
+    return decode_record(payload)
+
+@dataclass(frozen=True)
+class SyncPolicy:
+    """When appended records are fsynced.
+
+    `records` forces an fsync once that many records are pending and
+    `interval_ms` bounds how long a pending record may wait; 0 disables a
+    trigger, so ``SyncPolicy(0)`` never fsyncs and leaves flushing to the OS.
+    """
+    records: int = 1
+    interval_ms: float = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.records > 0 or self.interval_ms > 0
+
+class SegmentStore:
+    """File-backed record sequence made of size-bounded, append-only segments.
+
+    Behaves like the in-memory list used by `LedgerStore` (``append``,
+    ``len``, indexing, iteration). Sealed segments are memory-mapped on first
+    read; opening a store only lists the directory and reads the active index.
+
+    The active segment doubles as the write-ahead log: `write` only hands the
+    frame to the OS and `persist` applies the `SyncPolicy`. Concurrent callers
+    of `persist` share one fsync (group commit), and a torn tail left by a
+    crash is truncated when the store is reopened.
+    """
+
+    def __init__(self, path: str, segment_bytes: int = 64 << 20,
+                 sync: SyncPolicy = SyncPolicy()) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.sync_policy = sync
+        names = sorted(f[:-4] for f in os.listdir(path) if f.endswith(".seg"))
+        self._bases: List[int] = [int(n) for n in names] or [0]
+        self._maps: Dict[int, Tuple[mmap.mmap, mmap.mmap]] = {}
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                self.meta: Dict[str, Any] = json.load(f)
+        except FileNotFoundError:
+            self.meta = {}
+        self._lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._syncing = False
+        self._timer: Optional[threading.Timer] = None
+        self._open_active()
+        self._recover()
+        self._synced = len(self)
+        self._synced_at = time.monotonic()
+
+    def _file(self, base: int, ext: str) -> str:
+        return os.path.join(self.path, f"{base:020d}{ext}")
+
+    def _open_active(self) -> None:
+        base = self._bases[-1]
+        self._data = open(self._file(base, ".seg"), "a+b")
+        self._index = open(self._file(base, ".idx"), "a+b")
+        self._index.seek(0)
+        raw = self._index.read()
+        self._offsets = array("Q")
+        self._offsets.frombytes(raw[:len(raw) - len(raw) % _OFF.size])
+        self._size = self._data.seek(0, os.SEEK_END)
+
+    def _recover(self) -> None:
+        """Drop index entries and frames of the active segment torn by a crash."""
+        fd = self._data.fileno()
+
+        def frame_end(off: int) -> Optional[int]:
+            head = os.pread(fd, _FRAME.size, off)
+            if len(head) < _FRAME.size:
+                return None
+            length, crc = _FRAME.unpack(head)
+            if not length:  # a zero-filled tail reads as an empty frame with crc 0
+                return None
+            payload = os.pread(fd, length, off + _FRAME.size)
+            if len(payload) < length or zlib.crc32(payload) != crc or payload[:1] not in (b"\x01", b"{"):
+                return None
+            return off + _FRAME.size + length
+
+        offsets = self._offsets
+        end = None
+        while offsets and end is None:
+            end = frame_end(offsets[-1])
+            if end is None:
+                offsets.pop()
+        pos = end or 0
+        while True:  # frames whose index entry never made it to disk
+            end = frame_end(pos)
+            if end is None:
+                break
+            offsets.append(pos)
+            pos = end
+        if pos != self._size or self._index.tell() != _OFF.size * len(offsets):
+            self._data.truncate(pos)
+            self._index.truncate(0)
+            self._index.write(offsets.tobytes()); self._index.flush()
+            os.fsync(self._data.fileno()); os.fsync(self._index.fileno())
+            self._size = pos
+
+    def _roll(self) -> None:
+        if self.sync_policy.enabled:
+            os.fsync(self._data.fileno()); os.fsync(self._index.fileno())
+        self._data.close(); self._index.close()
+        self._bases.append(len(self))
+        self._open_active()
+
+    def __len__(self) -> int:
+        return self._bases[-1] + len(self._offsets)
+
+    def write(self, rec: LedgerRecord) -> int:
+        """Append `rec` without waiting for durability; see `persist`."""
+        payload = encode_record(rec)
+        frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._offsets and self._size + len(frame) > self.segment_bytes:
+                self._roll()
+            self._data.write(frame); self._data.flush()
+            self._index.write(_OFF.pack(self._size)); self._index.flush()
+            self._offsets.append(self._size)
+            self._size += len(frame)
+            return len(self) - 1
+
+    def write_many(self, recs: List[LedgerRecord]) -> int:
+        """Append `recs` with one write per touched segment; returns the first index."""
+        frames = []
+        for rec in recs:
+            payload = encode_record(rec)
+            frames.append(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        with self._lock:
+            first = len(self)
+            pending = 0
+            while pending < len(frames):
+                if self._offsets and self._size + len(frames[pending]) > self.segment_bytes:
+                    self._roll()
+                data, offs = bytearray(), array("Q")
+                size = self._size
+                for frame in frames[pending:]:
+                    if (offs or self._offsets) and size + len(frame) > self.segment_bytes:
+                        break
+                    offs.append(size)
+                    data += frame
+                    size += len(frame)
+                    pending += 1
+                self._data.write(data); self._data.flush()
+                self._index.write(offs.tobytes()); self._index.flush()
+                self._offsets.extend(offs)
+                self._size = size
+            return first
+
+    def append(self, rec: LedgerRecord) -> int:
+        index = self.write(rec)
+        self.persist(index + 1)
+        return index
+
+    def persist(self, upto: int) -> None:
+        """Apply the sync policy to the first `upto` records."""
+        policy = self.sync_policy
+        pending = upto - self._synced
+        if pending <= 0 or not policy.enabled:
+            return
+        if policy.records and pending >= policy.records:
+            self.sync(upto)
+        elif policy.interval_ms:
+            if (time.monotonic() - self._synced_at) * 1000 >= policy.interval_ms:
+                self.sync(upto)
+            elif self._timer is None:
+                self._timer = threading.Timer(policy.interval_ms / 1000, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_sync(self) -> None:
+        self._timer = None
+        if not self._data.closed:
+            self.sync()
+
+    def sync(self, upto: Optional[int] = None) -> None:
+        """fsync until the first `upto` records (default: all) are durable.
+
+        Only one thread fsyncs at a time; the others wait for it and return
+        straight away if its fsync already covered their records.
+        """
+        upto = len(self) if upto is None else upto
+        with self._cond:
+            while self._synced < upto and self._syncing:
+                self._cond.wait()
+            if self._synced >= upto:
+                return
+            self._syncing = True
+        target = self._synced
+        try:
+            with self._lock:  # dup so a concurrent segment roll cannot close them
+                target = len(self)
+                fds = [os.dup(self._data.fileno()), os.dup(self._index.fileno())]
+            for fd in fds:
+                os.fsync(fd); os.close(fd)
+        finally:
+            with self._cond:
+                self._syncing = False
+                self._synced = max(self._synced, target)
+                self._synced_at = time.monotonic()
+                self._cond.notify_all()
+
+    def _sealed(self, seg: int) -> Tuple[mmap.mmap, mmap.mmap]:
+        maps = self._maps.get(seg)
+        if maps is None:
+            base = self._bases[seg]
+            with open(self._file(base, ".seg"), "rb") as d, open(self._file(base, ".idx"), "rb") as i:
+                maps = (mmap.mmap(d.fileno(), 0, access=mmap.ACCESS_READ),
+                        mmap.mmap(i.fileno(), 0, access=mmap.ACCESS_READ))
+            self._maps[seg] = maps
+        return maps
+
+    def _read(self, index: int) -> bytes:
+        seg = bisect_right(self._bases, index) - 1
+        local = index - self._bases[seg]
+        if seg == len(self._bases) - 1:
+            with self._lock:  # a concurrent roll would swap the active files
+                if seg != len(self._bases) - 1:
+                    return self._read(index)
+                off = self._offsets[local]
+                length, crc = _FRAME.unpack(os.pread(self._data.fileno(), _FRAME.size, off))
+                payload = os.pread(self._data.fileno(), length, off + _FRAME.size)
+        else:
+            data, idx = self._sealed(seg)
+            (off,) = _OFF.unpack_from(idx, _OFF.size * local)
+            length, crc = _FRAME.unpack_from(data, off)
+            payload = data[off + _FRAME.size: off + _FRAME.size + length]
+        if zlib.crc32(payload) != crc:
+            raise IOError(f"corrupt record {index} in {self.path}")
+        return payload
+
+    def __getitem__(self, index: int) -> LedgerRecord:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return _decode(self._read(index))
+
+    def __iter__(self) -> Iterator[LedgerRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def write_file(self, name: str, data: bytes) -> None:
+        """Atomically replace the side file `name` in the store directory."""
+        tmp = os.path.join(self.path, name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def write_at(self, name: str, offset: int, data: bytes) -> None:
+        """Write `data` at `offset` of side file `name`, dropping anything after it."""
+        path = os.path.join(self.path, name)
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(data)
+            f.flush(); os.fsync(f.fileno())
+
+    def read_file(self, name: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.path, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save_meta(self) -> None:
+        self.write_file("meta.json", json.dumps(self.meta, sort_keys=True).encode())
+
+    def roots(self) -> List[Tuple[int, str]]:
+        out = []
+        try:
+            with open(os.path.join(self.path, "roots"), "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and line.endswith("\n"):  # skip a torn last line
+                        out.append((int(parts[0]), parts[1]))
+        except FileNotFoundError:
+            pass
+        return out
+
+    def truncate(self, size: int) -> None:
+        """Drop the records from `size` on, and every root that covers them."""
+        with self._lock:
+            if size >= len(self):
+                return
+            seg = bisect_right(self._bases, size) - 1
+            self._data.close(); self._index.close()
+            for s in range(seg, len(self._bases)):
+                for m in self._maps.pop(s, ()):
+                    m.close()
+                if s > seg:
+                    os.remove(self._file(self._bases[s], ".seg"))
+                    os.remove(self._file(self._bases[s], ".idx"))
+            base = self._bases[seg]
+            del self._bases[seg+1:]
+            with open(self._file(base, ".idx"), "r+b") as idx, open(self._file(base, ".seg"), "r+b") as data:
+                idx.seek(_OFF.size * (size - base))
+                head = idx.read(_OFF.size)
+                data.truncate(_OFF.unpack(head)[0] if len(head) == _OFF.size else 0)
+                idx.truncate(_OFF.size * (size - base))
+                os.fsync(data.fileno()); os.fsync(idx.fileno())
+            self._open_active()
+            self._synced = min(self._synced, size)
+            kept = "".join(f"{n} {r}\n" for n, r in self.roots() if n <= size)
+            self.write_file("roots", kept.encode())
+
+    def add_root(self, size: int, root: str) -> None:
+        # a root must never reach disk before the records it covers
+        if self.sync_policy.enabled:
+            self.sync(size)
+        with open(os.path.join(self.path, "roots"), "a") as f:
+            f.write(f"{size} {root}\n")
+            if self.sync_policy.enabled:
+                f.flush(); os.fsync(f.fileno())
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        if self.sync_policy.enabled and not self._data.closed:
+            self.sync()
+        for maps in self._maps.values():
+            for m in maps:
+                m.close()
+        self._maps.clear()
+        self._data.close(); self._index.close()
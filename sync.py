@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Any, Dict, Tuple
+import json
+from .ledger import LedgerStore
+
+# Replica catch-up over any pair of binary streams (a socket's makefile, the
+# two ends of pipes, a subprocess's stdin/stdout). The replica sends one JSON
+# request per line and the source answers each on one line, except "suffix",
+# which is answered by export lines up to an {"end": n} line:
+#
+#   hello                  -> {"size", "root", "leaf_version", "mode"}
+#   node {"k", "j"}        -> {"hash": complete node j of level k}
+#   suffix {"start"}       -> record/root lines for [start, size), then {"end": size}
+
+def _send(w: Any, obj: Dict[str, Any]) -> None:
+    w.write(json.dumps(obj).encode() + b"\n")
+    w.flush()
+
+def _recv(r: Any) -> Dict[str, Any]:
+    line = r.readline()
+    if not line:
+        raise EOFError("sync peer hung up")
+    return json.loads(line)
+
+def serve_sync(store: LedgerStore, rfile: Any, wfile: Any) -> None:
+    """Answer a replica's `pull` from `store`'s committed state until it hangs up."""
+    snap = None
+    while True:
+        line = rfile.readline()
+        if not line:
+            return
+        req = json.loads(line)
+        op = req.get("op")
+        if op == "hello":
+            snap = store.snapshot()
+            _send(wfile, {"size": snap.size if snap else 0, "root": snap.root if snap else None,
+                          "leaf_version": store.leaf_version, "mode": store.mode})
+        elif op == "node":
+            k, j = req["k"], req["j"]
+            if snap is None or (j + 1) << k > snap.size:
+                raise ValueError(f"node {j} on level {k} is not committed")
+            _send(wfile, {"hash": store._reader_tree().node(k, j, snap.size).hex()})
+        elif op == "suffix":
+            size = snap.size if snap else 0
+            roots = [(n, r) for n, r in zip(store._sizes[:snap.commits], store._roots[:snap.commits])
+                     if n > req["start"]] if snap else []
+            for out in store._lines(req["start"], size, roots):
+                wfile.write(out)
+            _send(wfile, {"end": size})
+        else:
+            raise ValueError(f"unknown sync op {op!r}")
+
+def pull(store: LedgerStore, rfile: Any, wfile: Any, batch: int = 4096) -> Tuple[int, int]:
+    """Make `store` a copy of the `serve_sync` peer's committed state.
+
+    The longest common prefix is found by comparing aligned complete nodes
+    from the top level down, one hash per level, so it costs O(log n) round
+    trips. Everything after it is truncated locally and only the source's
+    suffix is transferred, its roots re-verified as they arrive. Returns
+    ``(common prefix, records received)``.
+    """
+    _send(wfile, {"op": "hello"})
+    hello = _recv(rfile)
+    if not len(store):
+        store._set_meta("leaf_version", hello["leaf_version"])
+        store._set_meta("mode", hello["mode"])
+    elif (store.leaf_version, store.mode) != (hello["leaf_version"], hello["mode"]):
+        raise ValueError("replica and source use different leaf versions or modes")
+    n, m = hello["size"], len(store)
+    limit = min(m, n)
+    tree = store._tree  # a restored frontier holds the nodes an in-sync prefix compares
+    common = 0
+    for k in reversed(range(limit.bit_length())):
+        if common + (1 << k) <= limit:
+            j = common >> k
+            _send(wfile, {"op": "node", "k": k, "j": j})
+            try:
+                mine = tree.node(k, j, m)
+            except LookupError:  # pruned by the checkpoint: only now rebuild the history
+                mine = store._reader_tree().node(k, j, m)
+            if _recv(rfile)["hash"] == mine.hex():
+                common += 1 << k
+    if common < m:
+        store.truncate(common)
+    if common < n:
+        _send(wfile, {"op": "suffix", "start": common})
+
+        def lines():
+            while True:
+                line = rfile.readline()
+                if not line:
+                    raise EOFError("sync peer hung up")
+                yield line
+                if line.startswith(b'{"end"'):
+                    return
+
+        store._ingest(lines(), batch)
+    snap = store.snapshot()
+    if n and (snap is None or snap.size != n):
+        store.commit_root()  # same leaves, so the same root as the source's
+        snap = store.snapshot()
+    if n and snap.root != hello["root"]:
+        raise ValueError("replica did not reach the source's committed root")
+    return common, n - common
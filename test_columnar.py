@@ -0,0 +1,22 @@
+from onu_ledger import LedgerStore, LedgerRecord, ColumnarRecords, sha256
+
+def test_columnar_records_roundtrip_and_match_list_root():
+    recs = [
+        LedgerRecord("codec:v1", "reversible", sha256(b"in%d" % i), sha256(b"out%d" % i),
+                     sha256(b"x") if i % 3 else "sig-%d" % i, {"type": "integer-lifting"},
+                     float(i) if i % 2 else i, {"ts": float(i)} if i % 4 else None)
+        for i in range(50)
+    ]
+    plain, columnar = LedgerStore(), LedgerStore(records=ColumnarRecords())
+    for r in recs:
+        plain.append(r); columnar.append(r)
+    assert columnar.commit_root() == plain.commit_root()
+    cols = columnar._records
+    assert list(cols) == recs and cols[-1] == recs[-1]
+    assert type(cols[4].energy_delta) is int and cols.kind(7) == "reversible"
+    assert len(cols._strings) == 2 and len(cols._digests[0]) == 32 * 50
+    assert columnar.proof_of_inclusion(9)["record"]["delta_signature"] == "sig-9"
+    # the repeated gauge (and the None metadata) are interned; timestamps stay inline
+    assert len(cols._payloads) == 2 and cols._refs[0] == -1 and set(cols._refs[2::2]) == {0}
+    cols.truncate(20)
+    assert list(cols) == recs[:20]
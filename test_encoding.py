@@ -0,0 +1,43 @@
+from onu_ledger import LedgerRecord, encode_record, decode_record, leaf_digest, LEAF_JSON, LEAF_BINARY, sha256
+from onu_ledger.ledger import digest_obj
+from dataclasses import asdict
+import json
+
+def test_binary_encoding_roundtrip_and_canonical_order():
+    rec = LedgerRecord(
+        op_id="codec:v1", kind="reversible",
+        inputs_digest=sha256(b"a"), outputs_digest="not-a-digest",
+        delta_signature=sha256(b"x").upper(),
+        gauge={"type": "integer-lifting", "n": [1, 2.5, None, True, 2**70]},
+        energy_delta=0, metadata={"ts": 1.5, "b": b"\x00", "z": {"k": False}},
+    )
+    data = encode_record(rec)
+    assert data[0] == 1 and len(data) < len(json.dumps(asdict(rec), default=str))
+    back = decode_record(data)
+    assert back == LedgerRecord(**{**asdict(rec), "metadata": {**rec.metadata, "b": "b'\\x00'"}})
+    assert type(back.energy_delta) is int
+    same = LedgerRecord(**{**asdict(rec), "metadata": {"z": {"k": False}, "b": b"\x00", "ts": 1.5}})
+    assert encode_record(same) == data
+    assert leaf_digest(rec, LEAF_JSON).hex() == digest_obj(asdict(rec))
+    assert leaf_digest(rec, LEAF_BINARY) != leaf_digest(rec, LEAF_JSON)
+
+def test_non_json_payloads_survive_an_ndjson_round_trip():
+    import io
+    from onu_ledger import LedgerStore
+    store = LedgerStore()
+    store.append(LedgerRecord("op", "k", sha256(b"i"), sha256(b"o"), "sig",
+                              {1: "a", 10: [b"ab", (1, 2)]}, 0.0, {"v": b"ab", "w": {2.5: True}}))
+    root = store.commit_root()
+    buf = io.BytesIO()
+    store.export_ndjson(buf)
+    copy = LedgerStore()
+    copy.import_ndjson(io.BytesIO(buf.getvalue()))
+    assert copy._roots == [root] and copy._records[0].gauge == {"1": "a", "10": ["b'ab'", [1, 2]]}
+    store.append(LedgerRecord("op", "k", sha256(b"i"), sha256(b"o"), "sig", {1: "a", "b": 2}, 0.0,
+                              {None: {True: 1, "x": 2}}))
+    root = store.commit_root()
+    buf = io.BytesIO()
+    store.export_ndjson(buf)
+    copy = LedgerStore()
+    copy.import_ndjson(io.BytesIO(buf.getvalue()))
+    assert copy._roots[-1] == root and copy._records[1].metadata == {"null": {"true": 1, "x": 2}}
@@ -0,0 +1,154 @@
+from onu_ledger import LedgerStore, LedgerRecord, sha256
+from onu_ledger import RecordIndex, LineageGraph, EnergySums, TimeIndex
+import pytest
+
+def _fields(i):
+    # a chain: record i consumes the digest record i - 1 produced
+    return {"op_id": "codec:v%d" % (i % 3), "kind": "reversible" if i % 2 else "lossy",
+            "inputs_digest": sha256(b"%d" % i), "outputs_digest": sha256(b"%d" % (i + 1)),
+            "energy_delta": float(i % 5) - 2.0, "metadata": {"ts": 100.0 + i}}
+
+def test_indexes_match_scan_and_survive_reopen(tmp_path, make_rec):
+    path = str(tmp_path / "ledger")
+    store = LedgerStore.open(path, views=[RecordIndex()])
+    store.append_many(make_rec(i, **_fields(i)) for i in range(30))
+    store.append(make_rec(3, **_fields(3)))
+    for where in ({"op_id": "codec:v1"}, {"kind": "lossy", "op_id": "codec:v0"},
+                  {"outputs_digest": sha256(b"4")}, {"inputs_digest": sha256(b"3")}):
+        assert store.find(**where) == [i for i, r in enumerate(store._records)
+                                       if all(getattr(r, f) == v for f, v in where.items())]
+    assert store.find(inputs_digest=sha256(b"3")) == [3, 30]
+    assert store.find() == list(range(31)) and store.find(delta_signature=sha256(b"x"), kind="lossy") == list(range(0, 30, 2))
+    store.close()
+    assert not open(str(tmp_path / "ledger" / "index.view"), "rb").read().startswith(b"\x80")  # no pickles
+
+    reopened = LedgerStore.open(path, views=[RecordIndex()])
+    assert reopened.views["index"].size == 31 and reopened.views["index"]._tables == store.views["index"]._tables
+    reopened.append(make_rec(40, **_fields(40)))
+    assert reopened.find(outputs_digest=sha256(b"41")) == [31]
+    assert reopened.views["index"].count("op_id", "codec:v1") == 11
+    reopened.close()
+
+def test_lineage_queries_and_prov(make_rec):
+    from onu_ledger import prov_jsonld
+    store = LedgerStore(views=[LineageGraph()])
+    store.append_many(make_rec(i, **_fields(i)) for i in range(10))   # a chain: i feeds i + 1
+    store.append(make_rec(4, **_fields(4)))                           # a second producer of digest "5"
+    g = store.views["lineage"]
+    assert g.index is store.views["index"]  # a lineage view brings its own index
+    with pytest.raises(ValueError):
+        LedgerStore(views=[RecordIndex(), LineageGraph(), RecordIndex()])
+    assert g.parents(5) == [4, 10] and g.children(3) == [4, 10]
+    assert g.ancestors(6, depth=2) == [5, 4, 10]
+    assert g.descendants(7) == [8, 9]
+    assert g.lineage(sha256(b"3")) == [2, 1, 0]
+    order = list(g.topological())
+    assert sorted(order) == list(range(11))
+    assert all(order.index(p) < order.index(c) for c in range(11) for p in g.parents(c))
+
+    sub = [6] + g.ancestors(6)
+    doc = prov_jsonld([store._records[i] for i in sub], lineage=g, indices=sub)
+    informed = {(e["activity"], e["wasInformedBy"]) for e in doc["relations"] if "wasInformedBy" in e}
+    assert ("activity:6", "activity:5") in informed and ("activity:5", "activity:10") in informed
+    spaced = " ".join(sha256(b"x")[j:j+2] for j in range(0, 42, 2)) + "  "  # 64 chars, 21 bytes
+    store.append(make_rec(11, inputs_digest=spaced, outputs_digest=sha256(b"12")))
+    store.append(make_rec(12, **_fields(12)))
+    assert g._digest(0, 11) == spaced and g.parents(12) == [11]
+
+def test_digests_are_keyed_case_sensitively_like_the_scan(make_rec):
+    from onu_ledger import DigestFilter, SparseMerkleTree, verify_smt_proof
+    upper = sha256(b"u").upper()
+    store = LedgerStore(views=[RecordIndex(), DigestFilter(), SparseMerkleTree()])
+    store.append(make_rec(0, outputs_digest=upper))
+    for digest in (upper, upper.lower()):
+        hits = [i for i, r in enumerate(store._records) if r.outputs_digest == digest]
+        assert store.find(outputs_digest=digest) == hits and store.seen(digest) == bool(hits)
+        assert store.views["bloom"].might_contain(digest) == bool(hits)
+        smt = store.views["smt"]
+        assert verify_smt_proof(smt.prove(digest), smt.root()) == hits
+
+def test_bloom_filter_rejects_misses_before_the_index(tmp_path, make_rec):
+    from onu_ledger import DigestFilter
+    store = LedgerStore.open(str(tmp_path / "ledger"), views=[DigestFilter(fp_rate=0.01, block=64)])
+    store.append_many(make_rec(i, **_fields(i)) for i in range(4000))
+    assert len(store.views["bloom"]._filters) == 6  # 64, 128, ... 2048 records
+    assert all(store.seen(sha256(b"%d" % i)) for i in range(0, 4001, 500))
+    misses = [sha256(b"miss%d" % i) for i in range(5000)]
+    assert sum(store.views["bloom"].might_contain(d) for d in misses) < 5000 * 0.01 * 2  # ledger-wide rate
+    assert not any(store.seen(d) for d in misses[:50])
+    store.close()
+    reopened = LedgerStore.open(str(tmp_path / "ledger"), views=[DigestFilter(fp_rate=0.001, block=256)])
+    assert reopened.views["bloom"].block == 256 and reopened.views["bloom"].size == 4000  # rebuilt, not loaded
+    assert reopened.seen(sha256(b"3999")) and reopened.views["bloom"].nbytes() > store.views["bloom"].nbytes()
+    reopened.close()
+    small = DigestFilter(bits_per_key=4, block=64)
+    small.add(0, make_rec(0, **_fields(0)))
+    assert small.nbytes() * 2 < len(store.views["bloom"]._filters[0][0])
+
+def test_energy_sums_match_scans(make_rec):
+    store = LedgerStore(views=[EnergySums()])
+    recs = [make_rec(i, **_fields(i)) for i in range(257)]
+    store.append_many(recs[:100])
+    for r in recs[100:]:
+        store.append(r)
+    for start, stop in ((0, 257), (0, 0), (5, 6), (17, 200), (128, 256), (250, 999)):
+        window = recs[start:stop]
+        assert store.views["energy"].total(start, stop) == sum(r.energy_delta for r in window)
+        for kind in ("lossy", "reversible"):
+            assert store.views["energy"].total(start, stop, kind) == sum(r.energy_delta for r in window if r.kind == kind)
+    assert store.views["energy"].total(kind="missing") == 0.0
+    assert store.views["energy"].by_kind(0, 4) == {"lossy": -2.0, "reversible": 0.0}
+    assert store.views["energy"].residual(1.0, 0, 4) == 3.0
+    odd = LedgerStore(views=[RecordIndex(), EnergySums()])
+    for e in (1.5, "abc", 10 ** 400, 2):
+        odd.append(LedgerRecord("op", "k", sha256(b"i"), sha256(b"o"), "sig", {}, e, {}))
+    assert odd.views["energy"].size == odd.views["index"].size == 4 and odd.views["energy"].total() == 3.5
+
+def test_time_index_ranges_roots_and_energy(tmp_path, make_rec):
+    store = LedgerStore.open(str(tmp_path / "ledger"), segment_bytes=2048, views=[TimeIndex(), EnergySums()])
+    recs = [make_rec(i, **_fields(i)) for i in range(200)]
+    recs[50].metadata["ts"] = 0.0  # out of order: indexed at its predecessor's time
+    del recs[60].metadata["ts"]
+    recs[70].metadata["ts"] = 10 ** 400  # too large for a double
+    store.append_many(recs[:120])
+    root_120 = store.commit_root()
+    store.append_many(recs[120:])
+    assert [i for i, _ in store.between(110.0, 115.0)] == list(range(10, 15))
+    assert [i for i, _ in store.between(149.0, 151.0)] == [49, 50]
+    assert store.views["time"].count(159.0, 160.0) == store.views["time"].count(169.0, 170.0) == 2
+    assert store.views["time"].windows(100.0, 140.0, 10.0) == [10, 10, 10, 10]
+    assert store.root_at(219.5) == (120, root_120)
+    assert store.root_at(50.0) == (0, sha256(b""))
+    assert store.energy_between(100.0, 200.0) == sum(r.energy_delta for r in recs[:100])
+    assert store.energy_between(100.0, 110.0, kind="lossy") == sum(r.energy_delta for r in recs[:10:2])
+    store.close()
+    reopened = LedgerStore.open(str(tmp_path / "ledger"), views=[TimeIndex()])
+    assert reopened.views["time"].span(290.0, None) == (190, 200)
+    reopened.close()
+
+def test_views_truncate_to_what_a_rebuild_gives(make_rec):
+    from onu_ledger import DigestFilter, SparseMerkleTree
+    views = lambda: [LineageGraph(), DigestFilter(block=8), EnergySums(), TimeIndex(), SparseMerkleTree()]
+    store = LedgerStore(views=views())
+    store.append_many(make_rec(i, **_fields(i)) for i in range(40))
+    store.append_many(make_rec(i, **_fields(i % 7)) for i in range(40, 60))  # digests seen before
+    store.truncate(45)
+    fresh = LedgerStore(records=list(store._records), views=views())
+    for name in ("index", "lineage", "energy", "time"):
+        mine, rebuilt = dict(vars(store.views[name])), dict(vars(fresh.views[name]))
+        mine.pop("index", None), rebuilt.pop("index", None)
+        assert mine == rebuilt, name
+    assert len(store.views["bloom"]._filters) == len(fresh.views["bloom"]._filters) == 3
+    assert store.views["smt"].root() == fresh.views["smt"].root()
+    assert all(store.seen(r.outputs_digest) for r in store._records)
+
+def test_view_state_round_trips_without_pickle():
+    import pickle, pytest
+    from array import array
+    from onu_ledger.index import dump_state, load_state
+    state = {"n": 3, "f": float("inf"), "s": "x", "t": (1, None, True), "a": array("Q", [1, 2]),
+             "b": bytearray(b"\x00\n"), "d": {b"k" * 32: 1, "odd": array("d", [0.5]), (0, 1): "x"}}
+    assert load_state(dump_state(state)) == state
+    for bad in (pickle.dumps(state), b"{}\n", dump_state(state)[:-1]):
+        with pytest.raises(ValueError):
+            load_state(bad)
@@ -0,0 +1,138 @@
+from onu_ledger import LedgerStore, LedgerRecord, sha256, merkle_root, merkle_root_parallel, verify_inclusion, verify_consistency
+from onu_ledger import leaf_digest, seal, LEAF_JSON
+
+def test_incremental_root_matches_merkle_root(make_rec):
+    for version in (LEAF_JSON, None):
+        store = LedgerStore() if version is None else LedgerStore(leaf_version=version)
+        assert store.commit_root() == merkle_root([])
+        leaves = []
+        for i in range(70):
+            rec = make_rec(i)
+            store.append(rec)
+            leaves.append(leaf_digest(rec, store.leaf_version).hex())
+            assert store.commit_root() == merkle_root(leaves)
+
+def test_inclusion_proofs_verify_against_committed_root(make_rec):
+    store = LedgerStore()
+    for n in range(1, 12):
+        store.append(make_rec(n))
+        root = store.commit_root()
+        for i in range(n):
+            proof = store.proof_of_inclusion(i)
+            assert len(proof["path"]) == (n - 1).bit_length()
+            assert verify_inclusion(proof["leaf"], proof, root)
+    proof = store.proof_of_inclusion(3)
+    assert not verify_inclusion(store.proof_of_inclusion(4)["leaf"], proof, root)
+
+def test_consistency_proofs_between_committed_roots(make_rec):
+    store = LedgerStore()
+    store.commit_root()
+    for n in range(1, 20):
+        store.append(make_rec(n))
+        store.commit_root()
+    for first in range(len(store._roots)):
+        for second in range(first, len(store._roots)):
+            proof = store.consistency_proof(first, second)
+            assert verify_consistency(proof["first_root"], proof["second_root"], proof)
+            assert len(proof["peaks"]) + len(proof["path"]) <= 2 * 5 + 1
+    proof = store.consistency_proof(5, 9)
+    assert not verify_consistency(store._roots[6], store._roots[9], proof)
+    assert not verify_consistency(store._roots[5], store._roots[10], proof)
+
+def test_sealed_records_cache_leaves_and_reject_mutation(make_rec):
+    import pytest
+    plain, sealed = LedgerStore(), LedgerStore(sealed=True)
+    for i in range(5):
+        plain.append(make_rec(i)); sealed.append(make_rec(i))
+    assert plain.commit_root() == sealed.commit_root()
+    rec = sealed._records[2]
+    assert rec.leaf == sealed._tree.leaf(2) and rec.thaw() == make_rec(2)
+    with pytest.raises(Exception):
+        rec.kind = "other"
+    with pytest.raises(TypeError):
+        rec.gauge["type"] = "other"
+    with pytest.raises(TypeError):
+        rec.gauge |= {"type": "other"}
+    thawed = seal(LedgerRecord("op", "k", "i", "o", "s", {"n": [1, {"x": 2}]}, 0.0, None)).thaw()
+    thawed.gauge["n"][1]["x"] = 3
+    assert type(thawed.gauge) is dict and thawed.gauge == {"n": [1, {"x": 3}]}
+
+    plain._records[2].gauge["type"] = "other"
+    assert plain.modified_records() == [2]
+    with pytest.raises(ValueError):
+        plain.proof_of_inclusion(2)
+    assert sealed.audit() and sealed.modified_records() == []
+    object.__setattr__(sealed._records[3], "kind", "other")  # bypasses the frozen guard
+    assert sealed.modified_records() == [3] and not sealed.audit()
+    dict.__setitem__(sealed._records[3].gauge, "type", "other")  # the payload 1..4 share
+    assert sealed.modified_records() == [1, 2, 3, 4]
+
+def test_append_many_matches_single_appends(make_rec):
+    one, bulk = LedgerStore(), LedgerStore()
+    for i in range(1000):
+        one.append(make_rec(i))
+    assert bulk.append_many([], commit=False) == (0, 0, None)
+    tuples = (tuple(vars(make_rec(i)).values()) for i in range(3, 1000))
+    assert bulk.append_many([make_rec(0), make_rec(1), make_rec(2)]) == (0, 3, None)
+    start, stop, root = bulk.append_many(tuples, commit=True, batch=100)
+    assert (start, stop, root) == (3, 1000, one.commit_root())
+    assert bulk._records[500] == make_rec(500)
+
+def test_parallel_root_is_byte_identical(make_rec):
+    from concurrent.futures import ThreadPoolExecutor
+    for n in (1, 2, 3, 17, 64, 100, 257, 1000):
+        leaves = [sha256(b"%d" % i) for i in range(n)]
+        with ThreadPoolExecutor(4) as pool:
+            assert merkle_root_parallel(leaves, executor=pool, min_chunk=4) == merkle_root(leaves)
+    store = LedgerStore()
+    with ThreadPoolExecutor(2) as pool:
+        store.append_many((make_rec(i) for i in range(300)), commit=True, executor=pool)
+        assert store.audit(executor=pool) and store.audit(batch=64)
+        store._records[7].energy_delta = -1.0
+        assert not store.audit(executor=pool) and not store.audit(batch=64)
+
+def test_mmr_mode_proofs_survive_appends(tmp_path, make_rec):
+    store = LedgerStore(mode="mmr")
+    roots, proofs = [], {}
+    for i in range(45):
+        store.append(make_rec(i))
+        roots.append(store.commit_root())
+        proofs[i] = store.proof_of_inclusion(i)
+    for i, proof in proofs.items():
+        assert verify_inclusion(proof["leaf"], proof, roots[i])
+        # an old path still leads to the same peak; refreshing it only needs the new peaks
+        fresh = store.proof_of_inclusion(i)
+        assert fresh["path"][:len(proof["path"])] == proof["path"]
+        assert verify_inclusion(fresh["leaf"], fresh, roots[-1])
+    for first in (0, 1, 6, 7, 8, 31, 32):
+        for second in (first, 33, 44):
+            proof = store.consistency_proof(first, second)
+            assert verify_consistency(roots[first], roots[second], proof)
+            assert not verify_consistency(roots[first], roots[second - 1] if second > first else sha256(b"x"), proof)
+    assert store.audit()
+    durable = LedgerStore.open(str(tmp_path / "mmr"), mode="mmr", checkpoint_every=8)
+    durable.append_many([make_rec(i) for i in range(45)], commit=True)
+    assert durable.snapshot().root == roots[-1]
+    durable.close()
+    reopened = LedgerStore.open(str(tmp_path / "mmr"))
+    assert reopened.mode == "mmr" and reopened.commit_root() == roots[-1]
+    proof = reopened.proof_of_inclusion(3)
+    assert verify_inclusion(proof["leaf"], proof, roots[-1])
+    reopened.close()
+
+def test_multiproof_shares_siblings_and_verifies(make_rec):
+    from onu_ledger import verify_multiproof
+    for mode in ("tree", "mmr"):
+        store = LedgerStore(mode=mode)
+        store.append_many([make_rec(i) for i in range(1000)])
+        root = store.commit_root()
+        for indices in ([0], [999], [3, 4, 5], list(range(100, 356)), [0, 511, 512, 998, 999]):
+            proof = store.multiproof(indices)
+            assert verify_multiproof(proof["leaves"], proof, root)
+            separate = sum(len(p["path"]) + len(p.get("peaks", ())) for p in map(store.proof_of_inclusion, indices))
+            assert len(proof["path"]) <= separate
+            forged = list(proof["leaves"]); forged[-1] = sha256(b"forged")
+            assert not verify_multiproof(forged, proof, root)
+        clustered = store.multiproof(range(100, 356))
+        assert len(clustered["path"]) < 20  # versus ~2500 hashes as separate paths
+        assert not verify_multiproof(proof["leaves"], dict(proof, path=proof["path"][:-1]), root)
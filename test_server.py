@@ -0,0 +1,83 @@
+from dataclasses import asdict
+from onu_ledger import LedgerStore, LedgerRecord, LedgerServer, sha256, verify_inclusion
+from onu_ledger import RecordIndex
+from onu_ledger.index import View
+import asyncio, json
+
+async def _client(path, requests):
+    reader, writer = await asyncio.open_unix_connection(path)
+    for req in requests:  # pipelined: every request goes out before any reply is read
+        writer.write(json.dumps(req).encode() + b"\n")
+    await writer.drain()
+    replies = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    return replies
+
+def test_server_coalesces_pipelined_appends(tmp_path, make_rec):
+    store = LedgerStore.open(str(tmp_path / "ledger"), views=[RecordIndex()])
+    sock = str(tmp_path / "ledger.sock")
+
+    async def main():
+        server = LedgerServer(store)
+        listener = await server.start(sock)
+        async with listener:
+            batches = await asyncio.gather(*(
+                _client(sock, [{"id": j, "op": "append", "record": asdict(make_rec(100 * k + j)), "commit": j == 19}
+                               for j in range(20)])
+                for k in range(5)))
+            reads = await _client(sock, [
+                {"id": "p", "op": "prove", "index": 42},
+                {"id": "g", "op": "get", "index": 42},
+                {"id": "l", "op": "lookup", "digest": sha256(b"out307")},
+                {"id": "bad", "op": "get", "index": 1000},
+                {"id": "c", "op": "commit"},
+            ])
+        await server.stop()
+        return batches, reads
+
+    batches, reads = asyncio.run(main())
+    for replies in batches:
+        assert [r["id"] for r in replies] == list(range(20))
+        assert "root" in replies[-1]["result"]
+    indices = sorted(r["result"]["index"] for replies in batches for r in replies)
+    assert indices == list(range(100))
+    assert len(store._roots) < 5 + 1  # commits from concurrent clients were batched
+    proof, got, found, bad, commit = (r.get("result", r.get("error")) for r in reads)
+    assert verify_inclusion(proof["leaf"], proof, proof["root"])
+    assert LedgerRecord(**got["record"]) == store.get(42)
+    assert [LedgerRecord(**h["record"]) for h in found["records"]] == [make_rec(307)]
+    assert bad.startswith("IndexError")
+    assert commit == {"size": 100, "root": store.commit_root()}
+    store.close()
+
+class _Picky(View):
+    name = "picky"
+
+    def add(self, i, rec):
+        if rec.op_id == "boom":
+            raise ValueError("boom")
+        super().add(i, rec)
+
+def test_server_rejects_only_the_failing_record(tmp_path, make_rec):
+    store = LedgerStore.open(str(tmp_path / "ledger"), views=[RecordIndex()])
+    store._attach(_Picky())
+    sock = str(tmp_path / "ledger.sock")
+    boom = dict(asdict(make_rec(999)), op_id="boom")
+
+    async def main():
+        server = LedgerServer(store)
+        listener = await server.start(sock)
+        async with listener:
+            replies = await asyncio.gather(
+                _client(sock, [{"id": 0, "op": "append", "record": asdict(make_rec(0))}]),
+                _client(sock, [{"id": 1, "op": "append", "record": boom, "commit": True}]),
+                _client(sock, [{"id": 2, "op": "append", "record": asdict(make_rec(2))},
+                               {"id": 3, "op": "append", "record": {"op_id": "x"}}]))
+        await server.stop()
+        return [r for rs in replies for r in rs]
+
+    ok0, bad, ok2, malformed = asyncio.run(main())
+    assert bad["error"].startswith("ValueError") and malformed["error"].startswith("TypeError")
+    assert sorted((ok0["result"]["index"], ok2["result"]["index"])) == [0, 1]
+    assert len(store) == store.views["index"].size == 2
+    store.close()
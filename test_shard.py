@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+from onu_ledger import (LedgerStore, ShardedLedger, ShardProcess, merkle_root, sha256,
+                        shard_of, verify_sharded_inclusion)
+import pytest
+
+def _fields(i):
+    return {"op_id": "op%d" % (i % 7)}
+
+def test_sharded_proofs_compose_to_global_root(make_rec):
+    ledger = ShardedLedger([LedgerStore() for _ in range(3)], key="outputs_digest")
+    with ThreadPoolExecutor(3) as pool:
+        placed = ledger.append_many([make_rec(i, **_fields(i)) for i in range(50)], executor=pool)
+    placed.append(ledger.append(make_rec(50, **_fields(50))))
+    root = ledger.commit_root()
+    assert root == merkle_root([s.snapshot().root for s in ledger.shards])
+    assert len(ledger) == 51 and len({k for k, _ in placed}) == 3
+    for i, (k, j) in enumerate(placed):
+        assert k == shard_of(make_rec(i, **_fields(i)), 3, "outputs_digest")
+        proof = ledger.proof_of_inclusion(k, j)
+        assert proof["record"]["energy_delta"] == float(i)
+        assert verify_sharded_inclusion(proof["leaf"], proof, root)
+    assert not verify_sharded_inclusion(proof["leaf"], proof, sha256(b"other"))
+
+def test_sharded_ledger_reopens_and_checks_layout(tmp_path, make_rec):
+    path = str(tmp_path / "sharded")
+    ledger = ShardedLedger.open(path, 4)
+    for i in range(30):
+        ledger.append(make_rec(i, **_fields(i)))
+    root = ledger.commit_root()
+    ledger.close()
+    with pytest.raises(ValueError):
+        ShardedLedger.open(path, 5)
+    ledger = ShardedLedger.open(path, 4)
+    assert ledger.roots() == [root] and len(ledger) == 30
+    k, j = ledger.append(make_rec(0, **_fields(0)))
+    assert ledger.proof_of_inclusion(k, j - 1)["root"] == root
+    ledger.close()
+
+def test_process_shards_own_their_directories(tmp_path, make_rec):
+    path = str(tmp_path / "sharded")
+    ledger = ShardedLedger.open(path, 3, processes=True, segment_bytes=4096)
+    placed = ledger.append_many([make_rec(i, **_fields(i)) for i in range(60)])
+    root = ledger.commit_root()
+    with pytest.raises(BlockingIOError):
+        ShardedLedger.open(path, 3)
+    with pytest.raises(BlockingIOError):
+        ShardProcess(ShardedLedger.shard_path(path, 0))
+    k, j = placed[41]
+    proof = ledger.proof_of_inclusion(k, j)
+    assert proof["record"]["energy_delta"] == 41.0 and verify_sharded_inclusion(proof["leaf"], proof, root)
+    assert len(ledger) == 60
+    ledger.close()
+    ledger = ShardedLedger.open(path, 3)  # the same directories, served in-process
+    assert ledger.roots() == [root] and root == merkle_root([s.snapshot().root for s in ledger.shards])
+    ledger.close()
@@ -0,0 +1,38 @@
+from onu_ledger import LedgerStore, SparseMerkleTree, sha256, verify_smt_proof
+
+def _fields(i):
+    return {"outputs_digest": sha256(b"out%d" % (i % 40))}
+
+def test_membership_and_non_membership_proofs(make_rec):
+    store = LedgerStore(views=[SparseMerkleTree()])
+    store.append_many([make_rec(i, **_fields(i)) for i in range(100)])
+    root = store.views["smt"].root()
+    proof = store.views["smt"].prove(sha256(b"out7"))
+    assert verify_smt_proof(proof, root) == [7, 47, 87]
+    assert len(proof["siblings"]) <= 256
+    absent = store.views["smt"].prove(sha256(b"never recorded"))
+    assert verify_smt_proof(absent, root) == []
+    assert verify_smt_proof(store.views["smt"].prove("not-a-hex-digest"), root) == []
+    # a proof is bound to its digest, its indices and the root
+    assert verify_smt_proof(dict(proof, digest=sha256(b"out8")), root) is None
+    assert verify_smt_proof(dict(proof, leaf=[proof["leaf"][0], "00" * 8]), root) is None
+    store.append(make_rec(7, **_fields(7)))
+    assert verify_smt_proof(proof, store.views["smt"].root()) is None
+    assert verify_smt_proof(store.views["smt"].prove(sha256(b"out7")), store.views["smt"].root()) == [7, 47, 87, 100]
+
+def test_batched_updates_match_one_at_a_time(tmp_path, make_rec):
+    one, batch = SparseMerkleTree(), SparseMerkleTree()
+    pairs = [(sha256(b"k%d" % (i % 300)), i) for i in range(500)]
+    for pair in pairs:
+        one.update([pair])
+    batch.update(pairs[:17]); batch.update(pairs[17:])
+    assert one.root() == batch.root() != SparseMerkleTree().root()
+    store = LedgerStore.open(str(tmp_path / "ledger"), views=[SparseMerkleTree()])
+    store.append_many([make_rec(i, **_fields(i)) for i in range(60)], commit=True)
+    root = store.views["smt"].root()
+    store.close()
+    reopened = LedgerStore.open(str(tmp_path / "ledger"), views=[SparseMerkleTree()])
+    assert reopened.views["smt"].root() == root and reopened.views["smt"]._branches == store.views["smt"]._branches
+    reopened.truncate(30)
+    assert verify_smt_proof(reopened.views["smt"].prove(sha256(b"out35")), reopened.views["smt"].root()) == []
+    reopened.close()
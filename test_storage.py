@@ -0,0 +1,168 @@
+from onu_ledger import LedgerStore, LedgerRecord, SyncPolicy, sha256
+from onu_ledger import RecordIndex
+import os
+
+def test_segment_store_reopens_with_same_records_and_roots(tmp_path, make_rec):
+    path = str(tmp_path / "ledger")
+    store = LedgerStore.open(path, segment_bytes=1024)
+    for i in range(40):
+        store.append(make_rec(i))
+        if i % 7 == 0:
+            store.commit_root()
+    root = store.commit_root()
+    store.close()
+    assert len([f for f in os.listdir(path) if f.endswith(".seg")]) > 3
+
+    reopened = LedgerStore.open(path, segment_bytes=1024)
+    assert reopened._roots == store._roots
+    assert reopened.commit_root() == root
+    assert reopened._records[17] == make_rec(17)
+    assert list(reopened._records) == [make_rec(i) for i in range(40)]
+    reopened.close()
+
+def test_recovery_truncates_torn_tail_and_stale_roots(tmp_path, make_rec):
+    path = str(tmp_path / "ledger")
+    store = LedgerStore.open(path, sync=SyncPolicy(records=4))
+    for i in range(10):
+        store.append(make_rec(i))
+    good = store.commit_root()
+    store.append(make_rec(10))
+    store.commit_root()
+    store.close()
+    seg = os.path.join(path, "%020d.seg" % 0)
+    with open(seg, "r+b") as f:  # tear the last frame in half
+        f.truncate(os.path.getsize(seg) - 20)
+
+    reopened = LedgerStore.open(path, sync=SyncPolicy(0))
+    assert len(reopened._records) == 10
+    assert reopened._roots == [good]
+    assert reopened.commit_root() == good
+    assert reopened.append(make_rec(10)) == 10
+    reopened.close()
+
+    with open(seg, "ab") as f:  # power loss can leave zeros instead of a torn frame
+        f.write(bytes(64))
+    reopened = LedgerStore.open(path)
+    assert len(reopened._records) == 11 and reopened.append(make_rec(11)) == 11
+    reopened.close()
+
+def test_group_commit_from_many_threads(tmp_path, make_rec):
+    import threading
+    store = LedgerStore.open(str(tmp_path / "ledger"))
+    threads = [threading.Thread(target=lambda k=k: [store.append(make_rec(100 * k + i)) for i in range(25)])
+               for k in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(store._records) == 100 and store._records._synced == 100
+    root = store.commit_root()
+    store.close()
+    reopened = LedgerStore.open(str(tmp_path / "ledger"))
+    assert reopened._roots == store._roots and reopened._sizes == sorted(reopened._sizes)
+    assert reopened.commit_root() == root
+    reopened.close()
+
+def test_append_many_spans_segments(tmp_path, make_rec):
+    path = str(tmp_path / "ledger")
+    store = LedgerStore.open(path, segment_bytes=2048)
+    start, stop, root = store.append_many((make_rec(i) for i in range(60)), commit=True, batch=25)
+    store.close()
+    assert (start, stop) == (0, 60)
+    reopened = LedgerStore.open(path, segment_bytes=2048)
+    assert list(reopened._records) == [make_rec(i) for i in range(60)]
+    assert reopened._roots == [root]
+    reopened.close()
+
+def test_ndjson_roundtrip_plain_and_compressed(tmp_path, make_rec):
+    import io, pytest
+    store = LedgerStore()
+    store.commit_root()
+    for i in range(25):
+        store.append(make_rec(i))
+        if i % 10 == 9:
+            store.commit_root()
+    for name in ("ledger.ndjson", "ledger.ndjson.gz", "ledger.ndjson.xz"):
+        store.export_ndjson(str(tmp_path / name))
+        copy = LedgerStore.open(str(tmp_path / (name + ".d")))
+        assert copy.import_ndjson(str(tmp_path / name)) == 25
+        assert copy._roots == store._roots and list(copy._records) == store._records
+        copy.close()
+
+    buf = io.BytesIO()
+    store.export_ndjson(buf, compress="gzip")
+    lines = io.BytesIO(__import__("gzip").decompress(buf.getvalue())).read().splitlines()
+    lines[5] = lines[5].replace(b"codec:v1", b"codec:v2")
+    with pytest.raises(ValueError):
+        LedgerStore().import_ndjson(io.BytesIO(b"\n".join(lines)))
+
+def test_ndjson_and_sealed_store_intern_repeated_payloads():
+    import io
+    store = LedgerStore(sealed=True)
+    for i in range(30):
+        store.append(LedgerRecord("op", "k", sha256(b"i%d" % i), sha256(b"o%d" % i), "sig",
+                                  {"type": "lift", "n": [1, 2]}, 0.0, {"ts": float(i)}))
+    root = store.commit_root()
+    assert store._records[1].gauge is store._records[29].gauge
+    assert store._records[1].metadata is not store._records[2].metadata
+    buf = io.BytesIO()
+    store.export_ndjson(buf)
+    lines = buf.getvalue().splitlines()
+    assert sum(b'"lift"' in l for l in lines) == 2  # inline once, then one payload line
+    copy = LedgerStore()
+    assert copy.import_ndjson(io.BytesIO(buf.getvalue())) == 30 and copy._roots == [root]
+    assert copy._records[5].gauge == {"type": "lift", "n": [1, 2]}
+    assert copy._records[5].gauge is not copy._records[6].gauge
+
+def test_checkpoint_restart_replays_only_the_tail(tmp_path, make_rec):
+    path = str(tmp_path / "ledger")
+    store = LedgerStore.open(path, views=[RecordIndex()], checkpoint_every=50)
+    for i in range(120):
+        store.append(make_rec(i))
+        if i % 10 == 9:
+            store.commit_root()
+    store.append(make_rec(120))
+    store._backend.sync()
+    roots = list(store._roots)  # no close(): the last checkpoint was at 100 records
+
+    reopened = LedgerStore.open(path, views=[RecordIndex()])
+    assert reopened._tree.partial and reopened._ckpt["size"] == 100
+    assert reopened._roots == roots and reopened.views["index"].size == 121
+    assert reopened.find(inputs_digest=sha256(b"in7")) == [7]
+    proof = reopened.proof_of_inclusion(3)
+    assert proof["root"] == roots[-1] and not reopened._tree.partial
+    assert reopened.consistency_proof(0)["first_size"] == 10
+    reopened.close()
+    store._backend.close()
+
+def test_concurrent_appenders_and_snapshot_readers(tmp_path, make_rec):
+    import threading
+    from onu_ledger import verify_inclusion
+    store = LedgerStore.open(str(tmp_path / "ledger"), concurrent=True, segment_bytes=4096,
+                             sync=SyncPolicy(records=16), checkpoint_every=20)
+    store.append(make_rec(-1)); store.commit_root()
+    errors = []
+
+    def writer(k):
+        for i in range(50):
+            store.append(make_rec(1000 * k + i))
+            if i % 10 == 0:
+                store.commit_root()
+
+    def reader():
+        for _ in range(100):
+            snap = store.snapshot()
+            proof = store.proof_of_inclusion(snap.size - 1, snap)
+            if not verify_inclusion(proof["leaf"], proof, snap.root):
+                errors.append(snap)
+
+    threads = [threading.Thread(target=writer, args=(k,)) for k in range(4)] + [threading.Thread(target=reader)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert not errors and len(store._records) == 201
+    assert sorted(r.energy_delta for r in store._records) == sorted(
+        [-1.0] + [float(1000 * k + i) for k in range(4) for i in range(50)])
+    root = store.commit_root()
+    store.close()
+    reopened = LedgerStore.open(str(tmp_path / "ledger"))
+    assert reopened._roots == store._roots and reopened._sizes == sorted(reopened._sizes)
+    assert reopened.commit_root() == root
+    reopened.close()
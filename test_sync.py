@@ -0,0 +1,51 @@
+from onu_ledger import LedgerStore, ColumnarRecords, sha256, serve_sync, pull
+from onu_ledger import RecordIndex, LineageGraph
+import socket, threading
+
+def _sync(source, replica):
+    a, b = socket.socketpair()
+    server = threading.Thread(target=serve_sync, args=(source, a.makefile("rb"), a.makefile("wb")))
+    server.start()
+    rfile, wfile = b.makefile("rb"), b.makefile("wb")
+    try:
+        return pull(replica, rfile, wfile)
+    finally:
+        wfile.close(); b.shutdown(socket.SHUT_WR)
+        server.join(); a.close(); b.close()
+
+def _source(make_rec, n):
+    source = LedgerStore()
+    for i in range(n):
+        source.append(make_rec(i))
+        if i % 9 == 0:
+            source.commit_root()
+    source.commit_root()
+    return source
+
+def test_pull_transfers_only_the_divergent_suffix(tmp_path, make_rec):
+    source = _source(make_rec, 300)
+    replica = LedgerStore(records=ColumnarRecords(), views=[RecordIndex()])
+    replica.append_many([make_rec(i) for i in range(123)] + [make_rec(i, op_id="codec:v1fork") for i in range(123, 150)], commit=True)
+    assert _sync(source, replica) == (123, 177)
+    assert replica.snapshot().root == source.snapshot().root
+    assert replica.find(op_id="codec:v1fork") == [] and replica.find(outputs_digest=sha256(b"out299")) == [299]
+    assert _sync(source, replica) == (300, 0)
+    empty = LedgerStore(leaf_version=0)
+    assert _sync(source, empty) == (0, 300) and empty.leaf_version == source.leaf_version
+
+def test_pull_truncates_a_durable_replica_past_its_checkpoint(tmp_path, make_rec):
+    source = _source(make_rec, 200)
+    replica = LedgerStore.open(str(tmp_path / "replica"), segment_bytes=2048, checkpoint_every=50, views=[LineageGraph()])
+    replica.append_many([make_rec(i) for i in range(40)] + [make_rec(i, op_id="codec:v1fork") for i in range(40, 180)], commit=True)
+    replica.checkpoint()
+    assert _sync(source, replica) == (40, 160)
+    root = replica.snapshot().root
+    replica.close()
+    reopened = LedgerStore.open(str(tmp_path / "replica"), views=[LineageGraph()])
+    assert reopened.snapshot().root == root == source.snapshot().root
+    assert [r.op_id for r in reopened._records] == ["codec:v1"] * 200
+    assert reopened.views["lineage"].size == 200
+    source.append_many([make_rec(i) for i in range(200, 230)], commit=True)
+    assert reopened._tree.partial and _sync(source, reopened) == (200, 30)
+    assert reopened._tree.partial  # the restored frontier answered every comparison
+    reopened.close()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, List, Optional, Tuple
+from .index import View
+
+class TimeIndex(View):
+    """Monotone index of ``metadata["ts"]`` for time-range seeks.
+
+    Records are append-only, so a record cannot precede the one before it: a
+    record stamped earlier than its predecessor, or not stamped with a number
+    a double can hold, is indexed at its predecessor's time. The resulting array is sorted, which
+    makes every seek a bisect over 8 bytes per record held in memory, however
+    the records themselves are stored.
+    """
+    name = "time"
+
+    def __init__(self, field: str = "ts") -> None:
+        super().__init__()
+        self.field = field
+        self._ts = array("d")
+
+    def reset(self) -> None:
+        self.__init__(self.field)
+
+    def loads(self, data: bytes) -> None:
+        field = self.field
+        super().loads(data)
+        if self.field != field:
+            self.__init__(field)  # saved for another field: rebuilt from the records
+
+    def add(self, i: int, rec: Any) -> None:
+        last = self._ts[-1] if self._ts else float("-inf")
+        ts = rec.metadata.get(self.field) if isinstance(rec.metadata, dict) else None
+        ok = isinstance(ts, (int, float)) and not isinstance(ts, bool) and ts > last
+        if ok and type(ts) is not float:
+            try:
+                ts = float(ts)
+            except OverflowError:  # an int no double can hold
+                ok = False
+        self._ts.append(ts if ok else last)
+        self.size = i + 1
+
+    def truncate(self, size: int, records: Any) -> bool:
+        del self._ts[size:]
+        self.size = size
+        return True
+
+    def span(self, t0: Optional[float] = None, t1: Optional[float] = None) -> Tuple[int, int]:
+        """Index range of the records with ``t0 <= ts < t1`` (None: unbounded)."""
+        start = 0 if t0 is None else bisect_left(self._ts, t0)
+        stop = len(self._ts) if t1 is None else bisect_left(self._ts, t1)
+        return start, max(start, stop)
+
+    def count(self, t0: Optional[float] = None, t1: Optional[float] = None) -> int:
+        start, stop = self.span(t0, t1)
+        return stop - start
+
+    def windows(self, t0: float, t1: float, width: float) -> List[int]:
+        """Record counts in consecutive windows ``[t0 + k*width, t0 + (k+1)*width)`` up to `t1`."""
+        assert width > 0
+        edges = []
+        t = t0
+        while t < t1:
+            edges.append(bisect_left(self._ts, t))
+            t += width
+        edges.append(bisect_left(self._ts, t1))
+        return [b - a for a, b in zip(edges, edges[1:])]
+
+    def size_at(self, t: float) -> int:
+        """Number of records stamped at or before `t`."""
+        return bisect_right(self._ts, t)